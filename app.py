@@ -1,12 +1,16 @@
-from flask import Flask, redirect, session
+from flask import Flask, redirect, session, jsonify
 import dash
 from flask_mail import Mail
 from flask_login import LoginManager
 from layout import get_layout, get_accounts_layout
 from callbacks import register_callbacks
 from auth import auth_bp, login_manager, mail
+from jobs import jobs_bp, fail_interrupted_jobs
+from chat import chat_bp
 from database import init_db, db
 from config import MAIL_USERNAME, MAIL_PASSWORD
+from cache import all_cache_stats
+from llm_gateway import gateway
 
 # Create Flask App
 server = Flask(__name__)
@@ -31,6 +35,8 @@ mail.init_app(server)  # ✅ Fix: Initialize Flask-Mail
 init_db(server)
 login_manager.init_app(server)
 server.register_blueprint(auth_bp, url_prefix="/auth")
+server.register_blueprint(jobs_bp, url_prefix="/jobs")  # ✅ Background job status polling
+server.register_blueprint(chat_bp, url_prefix="/chat")  # ✅ Streaming chat answers
 
 # Create Dash App
 app = dash.Dash(__name__, server=server, routes_pathname_prefix="/dashboard/")
@@ -58,6 +64,16 @@ def index():
 def session_debug():
     return str(session.items())  # ✅ Print all session data
 
+@server.route("/cache_stats")
+def cache_stats():
+    return jsonify(all_cache_stats())  # ✅ Hit ratio and entry age per cache
+
+@server.route("/llm_stats")
+def llm_stats():
+    return jsonify(gateway.stats())  # ✅ Queue depth and model latency of this worker
+
 
 if __name__ == '__main__':
+    with server.app_context():
+        fail_interrupted_jobs()  # ✅ Jobs of the previous run died with it
     server.run(host='0.0.0.0', port=8050, debug=True)
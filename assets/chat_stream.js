@@ -0,0 +1,65 @@
+// Streams chat answers from /chat/stream (server-sent events over a POST fetch)
+// into the chat-response component while they are generated.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    chat: {
+        send: function (nClicks, nSubmit, message, skipCache, useData) {
+            if (!message || !message.trim()) {
+                return window.dash_clientside.no_update;
+            }
+            const setProps = window.dash_clientside.set_props;
+            let answer = "";
+            let frame = null;
+            const render = function () {
+                frame = null;
+                setProps("chat-response", {children: answer});
+            };
+
+            setProps("chat-response", {children: "…"});
+            fetch("/chat/stream", {
+                method: "POST",
+                headers: {"Content-Type": "application/json"},
+                credentials: "same-origin",
+                body: JSON.stringify({
+                    message: message,
+                    cache: !(skipCache || []).includes("skip"),
+                    context: (useData || []).includes("data")
+                })
+            }).then(async function (response) {
+                if (!response.ok) {
+                    const body = await response.json().catch(function () { return {}; });
+                    setProps("chat-response", {children: body.error || `Error: ${response.status}`});
+                    return;
+                }
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                let buffer = "";
+                for (;;) {
+                    const {value, done} = await reader.read();
+                    if (done) {
+                        break;
+                    }
+                    buffer += decoder.decode(value, {stream: true});
+                    let boundary;
+                    while ((boundary = buffer.indexOf("\n\n")) >= 0) {
+                        const lines = buffer.slice(0, boundary).split("\n");
+                        buffer = buffer.slice(boundary + 2);
+                        const event = lines.find(function (l) { return l.startsWith("event: "); }).slice(7);
+                        const data = JSON.parse(lines.find(function (l) { return l.startsWith("data: "); }).slice(6));
+                        if (event === "delta") {
+                            answer += data.text;
+                            frame = frame || window.requestAnimationFrame(render);  // One render per frame
+                        } else if (event === "done") {
+                            render();
+                            setProps("chat-stream-done", {data: data});
+                        } else if (event === "error") {
+                            setProps("chat-response", {children: data.message});
+                        }
+                    }
+                }
+            }).catch(function (error) {
+                setProps("chat-response", {children: `Error: ${error}`});
+            });
+            return "";  // Clear the input while the answer streams in
+        }
+    }
+});
@@ -0,0 +1,158 @@
+import base64
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from yfinance.exceptions import YFRateLimitError
+from data_fetching import plan_history_fetch, download_history, store_history
+from database import db
+
+BATCH_WORKERS = 8  # Concurrent Yahoo Finance downloads
+YF_REQUESTS_PER_SECOND = 2.0  # Sustained provider request rate
+YF_BURST = 4  # Requests allowed back to back before the rate applies
+MAX_RETRIES = 5
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 60.0
+
+SYMBOL_PATTERN = re.compile(r"^[A-Z0-9.\-^=]{1,10}$")  # Fits Stock.symbol (String(10))
+
+
+class TokenBucket:
+    """Thread-safe token bucket; ``acquire`` blocks until a request may be sent."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Stop handing out tokens for a while, e.g. after the provider rate-limited us."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+def parse_symbol_list(text):
+    """Split free text (commas, whitespace, semicolons, one per line) into unique symbols."""
+    symbols = []
+    seen = set()
+    for token in re.split(r"[\s,;]+", text or ""):
+        symbol = token.strip().strip('"').upper()
+        if symbol in ("", "SYMBOL", "TICKER") or symbol in seen:
+            continue
+        if not SYMBOL_PATTERN.match(symbol):
+            logging.warning(f"Ignoring invalid symbol {symbol!r} in batch input.")
+            continue
+        seen.add(symbol)
+        symbols.append(symbol)
+    return symbols
+
+
+def parse_symbol_upload(contents):
+    """Decode a dcc.Upload data URL (text or CSV file) into a symbol list."""
+    if not contents:
+        return []
+    _, encoded = contents.split(",", 1)
+    return parse_symbol_list(base64.b64decode(encoded).decode("utf-8", errors="ignore"))
+
+
+def _download_with_retry(limiter, symbol, start_date, with_name):
+    """Download one symbol through the limiter, backing off exponentially on rate limits."""
+    for attempt in range(MAX_RETRIES + 1):
+        limiter.acquire()
+        try:
+            return download_history(symbol, start_date, with_name=with_name)
+        except YFRateLimitError:
+            if attempt == MAX_RETRIES:
+                raise
+            delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt)
+            delay += random.uniform(0, delay / 2)  # Jitter so threads don't retry in lockstep
+            logging.warning(f"Rate limited on {symbol}, retry {attempt + 1}/{MAX_RETRIES} in {delay:.1f}s.")
+            limiter.pause(delay)
+
+
+def fetch_symbols_batch(symbols, incremental=True, progress=None,
+                        max_workers=BATCH_WORKERS, rate=YF_REQUESTS_PER_SECOND):
+    """Fetch and store many symbols concurrently.
+
+    Downloads run on a thread pool governed by a shared token bucket; results
+    are bulk-written by the calling thread (which owns the app context) as
+    they arrive. Returns a per-symbol summary dict.
+    """
+    progress = progress or (lambda message, percent=None: None)
+    limiter = TokenBucket(rate, YF_BURST)
+    summary = {"written": {}, "skipped": [], "failed": {}}
+
+    plans = {}
+    for symbol in symbols:
+        stock_obj, start_date, skip_reason = plan_history_fetch(symbol, incremental)
+        if skip_reason:
+            summary["skipped"].append(symbol)
+        else:
+            plans[symbol] = (stock_obj, start_date)
+
+    total = len(symbols)
+    done = len(summary["skipped"])
+    progress(f"Fetching {len(plans)} symbols ({done} already up to date)...", 100 * done // max(total, 1))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="yf-batch") as pool:
+        futures = {
+            pool.submit(_download_with_retry, limiter, symbol, start_date, stock_obj is None): symbol
+            for symbol, (stock_obj, start_date) in plans.items()
+        }
+
+        for future in as_completed(futures):
+            symbol = futures[future]
+            stock_obj, start_date = plans[symbol]
+            done += 1
+            try:
+                df, name = future.result()
+                if df.empty:
+                    summary["failed"][symbol] = "No data found"
+                else:
+                    summary["written"][symbol] = store_history(
+                        symbol, df, stock_obj, name, incremental=start_date is not None,
+                        progress=lambda message, percent=None: None
+                    )
+            except Exception as e:
+                db.session.rollback()  # ✅ A failed flush/commit must not fail every later symbol
+                logging.warning(f"Batch fetch failed for {symbol}: {e}")
+                summary["failed"][symbol] = str(e)
+
+            progress(
+                f"{symbol} done ({done}/{total}, {len(summary['failed'])} failed)",
+                100 * done // max(total, 1)
+            )
+
+    elapsed = time.perf_counter() - started
+    rows = sum(summary["written"].values())
+    logging.info(
+        f"Batch ingest: {len(summary['written'])} symbols, {rows} rows, "
+        f"{len(summary['failed'])} failed in {elapsed:.1f}s"
+    )
+    progress(
+        f"Batch complete: {len(summary['written'])} fetched, {len(summary['skipped'])} up to date, "
+        f"{len(summary['failed'])} failed, {rows} rows in {elapsed:.1f}s",
+        100
+    )
+    return summary
@@ -0,0 +1,212 @@
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from config import CACHE_DB_PATH
+
+MARKET_TZ = ZoneInfo("America/New_York")
+MARKET_CLOSE_HOUR = 16
+CLOSE_PUBLISH_DELAY = timedelta(minutes=30)  # Providers publish the daily bar a little after the bell
+
+_caches = []  # Every DiskCache created, for stats reporting
+
+
+def next_market_close(now=None):
+    """Return the epoch time at which today's daily bar is (or the next one will be) published."""
+    now = now or datetime.now(MARKET_TZ)
+    close = now.replace(hour=MARKET_CLOSE_HOUR, minute=0, second=0, microsecond=0) + CLOSE_PUBLISH_DELAY
+
+    while close <= now or close.weekday() >= 5:  # ✅ Skip to the next weekday close
+        close += timedelta(days=1)
+    return close.timestamp()
+
+
+class CacheEntry:
+    """A cached value together with its bookkeeping timestamps."""
+
+    def __init__(self, value, created_at, expires_at):
+        self.value = value
+        self.created_at = created_at
+        self.expires_at = expires_at
+
+    @property
+    def is_fresh(self):
+        return time.time() < self.expires_at
+
+    @property
+    def age(self):
+        return time.time() - self.created_at
+
+
+class DiskCache:
+    """Pickle-backed key/value cache in a SQLite file shared by all app processes.
+
+    Entries carry an absolute expiry. Expired entries are kept so callers can
+    serve them stale while a refresh runs (see ``get_or_load``). When
+    ``max_entries`` is set the least recently used entries are evicted.
+    """
+
+    def __init__(self, namespace, path=CACHE_DB_PATH, max_entries=None):
+        self.namespace = namespace
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        _caches.append(self)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")  # ✅ Readers don't block the writer across workers
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entry (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_stats (
+                    namespace TEXT NOT NULL,
+                    outcome TEXT NOT NULL,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (namespace, outcome)
+                )
+            """)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        """Return the CacheEntry for ``key`` (fresh or stale), or None."""
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value, created_at, expires_at FROM cache_entry WHERE namespace = ? AND key = ?",
+            (self.namespace, key)
+        ).fetchone()
+        if row is None:
+            return None
+
+        conn.execute(
+            "UPDATE cache_entry SET last_access = ? WHERE namespace = ? AND key = ?",
+            (time.time(), self.namespace, key)
+        )
+        return CacheEntry(pickle.loads(row[0]), row[1], row[2])
+
+    def set(self, key, value, expires_at):
+        """Store ``value`` under ``key`` until the epoch time ``expires_at``."""
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache_entry (namespace, key, value, created_at, expires_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (self.namespace, key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), now, expires_at, now)
+        )
+        if self.max_entries:
+            conn.execute(
+                "DELETE FROM cache_entry WHERE namespace = ? AND key NOT IN ("
+                "SELECT key FROM cache_entry WHERE namespace = ? ORDER BY last_access DESC LIMIT ?)",
+                (self.namespace, self.namespace, self.max_entries)
+            )
+
+    def delete(self, key):
+        self._connect().execute(
+            "DELETE FROM cache_entry WHERE namespace = ? AND key = ?", (self.namespace, key)
+        )
+
+    def delete_prefix(self, prefix):
+        """Delete every entry whose key starts with ``prefix``; returns how many were removed."""
+        return self._connect().execute(
+            "DELETE FROM cache_entry WHERE namespace = ? AND substr(key, 1, ?) = ?",
+            (self.namespace, len(prefix), prefix)
+        ).rowcount
+
+    def record(self, outcome, amount=1):
+        """Bump a shared counter (hit / stale / miss / ...) for this namespace."""
+        self._connect().execute(
+            "INSERT INTO cache_stats (namespace, outcome, count) VALUES (?, ?, ?) "
+            "ON CONFLICT(namespace, outcome) DO UPDATE SET count = count + excluded.count",
+            (self.namespace, outcome, amount)
+        )
+
+    def get_or_load(self, key, loader, expires_at):
+        """Return the cached value for ``key``, loading it on a miss.
+
+        Stale entries are returned immediately while ``loader`` refreshes them
+        on a background thread (stale-while-revalidate). ``expires_at`` is a
+        callable returning the expiry for a freshly loaded value.
+        """
+        entry = self.get(key)
+
+        if entry is not None and entry.is_fresh:
+            self.record("hit")
+            logging.debug(f"Cache hit {self.namespace}:{key} (age {entry.age:.0f}s)")
+            return entry.value
+
+        if entry is not None:
+            self.record("stale")
+            logging.info(f"Serving stale {self.namespace}:{key} (age {entry.age:.0f}s), refreshing in background")
+            self._refresh_in_background(key, loader, expires_at)
+            return entry.value
+
+        self.record("miss")
+        value = loader()
+        self.set(key, value, expires_at())
+        return value
+
+    def _refresh_in_background(self, key, loader, expires_at):
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return  # ✅ One refresh per key per process
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self.set(key, loader(), expires_at())
+            except Exception as e:
+                logging.warning(f"Background refresh of {self.namespace}:{key} failed: {e}")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name=f"cache-refresh-{key}", daemon=True).start()
+
+    def stats(self):
+        """Return hit/miss counters, hit ratio and entry ages for this namespace."""
+        conn = self._connect()
+        counts = dict(conn.execute(
+            "SELECT outcome, count FROM cache_stats WHERE namespace = ?", (self.namespace,)
+        ).fetchall())
+        entries, oldest, newest = conn.execute(
+            "SELECT COUNT(*), MIN(created_at), MAX(created_at) FROM cache_entry WHERE namespace = ?",
+            (self.namespace,)
+        ).fetchone()
+
+        lookups = counts.get("hit", 0) + counts.get("stale", 0) + counts.get("miss", 0)
+        now = time.time()
+        return {
+            "namespace": self.namespace,
+            "entries": entries,
+            "counts": counts,
+            "hit_ratio": (counts.get("hit", 0) + counts.get("stale", 0)) / lookups if lookups else None,
+            "oldest_entry_age_s": round(now - oldest) if oldest else None,
+            "newest_entry_age_s": round(now - newest) if newest else None,
+        }
+
+
+provider_cache = DiskCache("provider")  # ✅ Market data provider responses
+
+
+def all_cache_stats():
+    """Collect statistics for every cache namespace in use."""
+    return [cache.stats() for cache in _caches]
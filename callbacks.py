@@ -1,19 +1,23 @@
 import logging
 from faker import Faker
 import pandas as pd
-from dash import Output, Input, State, html, no_update, dcc
+from dash import Output, Input, State, html, no_update, dcc, ctx, ClientsideFunction, Patch
 import plotly.graph_objs as go
-from openai import OpenAI
-from data_fetching import fetch_stock_data, fetch_historical_stock_data, fetch_local_stock_data, get_available_stocks, get_all_accounts, get_transaction_data
+from data_fetching import fetch_stock_data, fetch_local_stock_data, time_range_start, get_available_stocks, get_all_accounts, get_transaction_page, get_transaction_aggregates, transaction_table
+from jobs import submit_fetch_job, submit_batch_fetch_job, submit_import_job, submit_recategorize_job, submit_suggest_rules_job, get_job_status
+from categorizer import validate_rule, rule_records, suggestion_records, accept_suggestions, dismiss_suggestions
+from transaction_import import missing_migration
+from chat import history_page, history_cursor, CHAT_HISTORY_PAGE_SIZE
+from batch_ingest import parse_symbol_list, parse_symbol_upload
+from downsampling import downsample, points_for_width
+from traces import line_traces
+from figure_cache import figure_key, cached_figure, is_current
 from plots import generate_line_chart, generate_stacked_area_chart, generate_stacked_bar_chart, generate_pie_chart
-from config import apikeys
 from database import db
-from models import ChatMessage, User
+from models import ChatMessage, User, CategoryRule
 from flask import session, current_app
 from flask_login import current_user
 
-chatgpt_api_key = apikeys["chatgpt"]
-
 fake = Faker()
 
 def generate_sample_accounts():
@@ -30,78 +34,150 @@ def generate_sample_accounts():
     return pd.DataFrame(sample_data)
 
 
+RANGE_UNCHANGED = object()  # relayoutData that doesn't touch the x axis (autosize, y zoom, ...)
+RANGE_PADDING = 0.1  # Load a little beyond each edge so short pans don't show gaps
+
+
+def parse_relayout_range(relayout):
+    """Extract the visible x range from a graph's relayoutData.
+
+    Returns ``(start, end)`` timestamps for a zoom, None when the axis was reset
+    to show everything, or RANGE_UNCHANGED when the x axis was not touched.
+    """
+    if not relayout:
+        return RANGE_UNCHANGED
+    if relayout.get("xaxis.autorange"):
+        return None
+
+    if "xaxis.range[0]" in relayout and "xaxis.range[1]" in relayout:
+        bounds = relayout["xaxis.range[0]"], relayout["xaxis.range[1]"]
+    elif isinstance(relayout.get("xaxis.range"), list):
+        bounds = relayout["xaxis.range"]
+    else:
+        return RANGE_UNCHANGED
+
+    try:
+        start, end = (pd.Timestamp(bound) for bound in bounds)
+    except (TypeError, ValueError):
+        return RANGE_UNCHANGED
+    return (start, end) if start <= end else (end, start)
+
+
+def pad_range(start, end):
+    """Widen a visible range by RANGE_PADDING of its span on each side."""
+    pad = (end - start) * RANGE_PADDING
+    return start - pad, end + pad
+
+
 def register_callbacks(app, server):
     """Register Dash callbacks for stock chart, chat AI, and dark mode toggle."""
 
+    # Report each graph's zoom range together with its pixel width
+    for graph_id, view_id in (("stock-chart", "stock-chart-view"), ("local-stock-chart", "local-chart-view")):
+        app.clientside_callback(
+            f"""
+            function(relayoutData) {{
+                const graph = document.getElementById("{graph_id}");
+                return {{relayout: relayoutData, width: graph ? graph.offsetWidth : null}};
+            }}
+            """,
+            Output(view_id, "data"),
+            Input(graph_id, "relayoutData"),
+            prevent_initial_call=True
+        )
+
     # Stock Chart Update
     @app.callback(
         Output("stock-chart", "figure"),
         Input("stock-dropdown", "value"),
+        Input("stock-chart-view", "data"),
         prevent_initial_call=True
     )
-    def update_stock_chart(symbol):
-        print('symbol =', symbol)
-        """Update stock chart based on selected stock."""
+    def update_stock_chart(symbol, view):
+        """Update stock chart based on selected stock and the visible date range."""
+        x_range, width = None, None
+        if ctx.triggered_id == "stock-chart-view":
+            x_range = parse_relayout_range(view.get("relayout"))
+            if x_range is RANGE_UNCHANGED:
+                return no_update  # Single output: a tuple here would be sent as the figure
+            width = view.get("width")
+
         df_stock = fetch_stock_data(symbol=symbol)
         # df_stock.to_excel(f'df_{symbol}.xlsx')
+        if x_range and not df_stock.empty:
+            start, end = pad_range(*x_range)
+            df_stock = df_stock.loc[start:end]  # ✅ Index is sorted, so this is a binary search
+        x, y = downsample(df_stock.index.to_numpy(), df_stock["Close"].to_numpy(), points_for_width(width))
         figure = {
-            'data': [
-                go.Scatter(
-                    x=df_stock.index,
-                    y=df_stock["Close"],
-                    mode='lines',
-                    name=symbol
-                )
-            ],
+            'data': line_traces([(symbol, x, y)]),  # ✅ Binary x/y, WebGL for long series
             'layout': go.Layout(
                 title=f"Stock Price Over Time ({symbol})",
-                xaxis={'title': "Date"},
+                xaxis={'title': "Date", 'type': "date"},
                 yaxis={'title': "Closing Price (USD)"},
-                hovermode='closest'
+                hovermode='closest',
+                uirevision=symbol  # ✅ Keep the user's zoom while data is re-queried
             )
         }
         return figure
 
-    client = OpenAI(api_key=chatgpt_api_key)  # ✅ Initialize OpenAI Client
-    # Register Dash callbacks including user-based chat storage.
-    @app.callback(
-        Output("chat-response", "children"),
-        Output("chat-history", "children"),
+    # Chat: assets/chat_stream.js streams the answer from /chat/stream (see chat.py) into chat-response
+    app.clientside_callback(
+        ClientsideFunction(namespace="chat", function_name="send"),
+        Output("chat-input", "value"),
         [Input("send-button", "n_clicks"), Input("chat-input", "n_submit")],  # ✅ Detect Enter key
         State("chat-input", "value"),
+        State("chat-no-cache", "value"),
+        State("chat-use-data", "value"),
         prevent_initial_call=True
     )
 
-    def chat_with_gpt(n_clicks, n_submit, user_input):
-        """Send user input to ChatGPT and update chat history."""
-        with server.app_context():  # ✅ Ensure we're in Flask context
-            if not session.get("user_id"):
-                return "Please log in to use chat.", []
-
-            user_id = session["user_id"]
-            try:
-                response = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[{"role": "user", "content": user_input}]
-                )
-                bot_response = response.choices[0].message.content
-
-                chat_message = ChatMessage(user_id=user_id, user_message=user_input, bot_response=bot_response)
-                db.session.add(chat_message)
-                db.session.commit()
+    def render_chat_message(msg):
+        return html.Div([
+            html.P(f"🧑‍💻 {msg.user_message}", className="chat-user"),
+            html.P(f"🤖 {msg.bot_response}", className="chat-bot")
+        ])
 
-                return bot_response, get_chat_history(user_id)
-            except Exception as e:
-                return f"Error: {str(e)}", []
+    @app.callback(
+        Output("chat-history", "children"),
+        Output("chat-history-cursor", "data"),
+        Output("chat-load-older", "disabled"),
+        Input("chat-load-older", "n_clicks"),
+        State("chat-history-cursor", "data")
+    )
+    def load_chat_history(n_clicks, cursor):
+        """Show the latest messages on page load and add one older page per "Load older" click."""
+        if not session.get("user_id"):
+            return [], None, True
+
+        first_page = not n_clicks
+        messages = history_page(session["user_id"], before=None if first_page else cursor)
+        if not messages:
+            return ([] if first_page else no_update), (None if first_page else cursor), True
+
+        rendered = [render_chat_message(msg) for msg in messages]
+        if first_page:
+            children = rendered
+        else:
+            children = Patch()
+            children.extend(rendered)  # ✅ Only the older page travels to the browser
+        return children, history_cursor(messages[-1]), len(messages) < CHAT_HISTORY_PAGE_SIZE
 
-    def get_chat_history(user_id):
-        """Retrieve user-specific chat history from database."""
-        with server.app_context():  # ✅ Ensure we're in Flask context
-            messages = ChatMessage.query.filter_by(user_id=user_id).order_by(ChatMessage.timestamp.desc()).limit(10).all()
-            return [html.Div([
-                html.P(f"🧑‍💻 {msg.user_message}", className="chat-user"),
-                html.P(f"🤖 {msg.bot_response}", className="chat-bot")
-            ]) for msg in messages]
+    @app.callback(
+        Output("chat-history", "children", allow_duplicate=True),
+        Output("chat-history-cursor", "data", allow_duplicate=True),
+        Input("chat-stream-done", "data"),
+        State("chat-history-cursor", "data"),
+        prevent_initial_call=True
+    )
+    def append_chat_message(done, cursor):
+        """Prepend the message pair just answered; the payload is one pair however long the history."""
+        msg = db.session.get(ChatMessage, done["id"]) if done and session.get("user_id") else None
+        if msg is None or msg.user_id != session["user_id"]:
+            return no_update, no_update
+
+        children = Patch()
+        children.prepend(render_chat_message(msg))
+        return children, cursor or history_cursor(msg)
 
     # Dark Mode Toggle
     @app.callback(
@@ -143,52 +219,122 @@ def register_callbacks(app, server):
         return html.Div(nav_links, className="navbar")
 
     @app.callback(
-        Output("fetch-status", "children"),
-        [Input("fetch-button", "n_clicks"), Input("stock-input", "n_submit")],  # ✅ Add n_submit
-        State("stock-input", "value"),
+        Output("fetch-job-store", "data"),
+        [Input("fetch-button", "n_clicks"), Input("stock-input", "n_submit"),  # ✅ Add n_submit
+         Input("batch-fetch-button", "n_clicks")],
+        [State("stock-input", "value"), State("batch-symbols-input", "value"),
+         State("batch-symbols-upload", "contents")],
         prevent_initial_call=True
     )
-    def fetch_historical_data(n_clicks, n_submit, symbol):
-        """Fetch historical stock data when the button is clicked."""
+    def fetch_historical_data(n_clicks, n_submit, n_batch, symbol, batch_text, batch_file):
+        """Queue a background fetch (one symbol or a batch) and hand its job id to the status poller."""
+        if not session.get("user_id"):
+            return {"error": "Please log in to fetch data."}  # Job status is only shown to its owner
+
+        if ctx.triggered_id == "batch-fetch-button":
+            symbols = parse_symbol_list(batch_text) + parse_symbol_upload(batch_file)
+            symbols = list(dict.fromkeys(symbols))  # ✅ Dedupe text + file input, keep order
+            if not symbols:
+                return {"error": "Please enter or upload a list of stock symbols."}
+
+            with server.app_context():
+                job_id = submit_batch_fetch_job(server, symbols, user_id=session.get("user_id"))
+            return {"job_id": job_id}
+
         if not symbol:
-            return "Please enter a stock symbol."
+            return {"error": "Please enter a stock symbol."}
 
         with server.app_context():
-            session["progress"] = "Starting fetch..."
-            fetch_historical_stock_data(symbol.upper())
-            return session.get("progress", "Fetching data...")
+            job_id = submit_fetch_job(server, symbol.strip().upper(), user_id=session.get("user_id"))
+        return {"job_id": job_id}
+
+    @app.callback(
+        Output("fetch-status", "children"),
+        Output("fetch-job-poll", "disabled"),
+        Input("fetch-job-store", "data"),
+        Input("fetch-job-poll", "n_intervals"),
+        prevent_initial_call=True
+    )
+    def poll_fetch_job(job_data, n_intervals):
+        """Show the progress of the current fetch job until it finishes."""
+        return render_job_status(job_data)
+
+    def render_job_status(job_data):
+        """Progress bar and message for a job store, plus whether polling can stop."""
+        if not job_data:
+            return no_update, True
+        if job_data.get("error"):
+            return job_data["error"], True
+
+        with server.app_context():
+            status = get_job_status(job_data["job_id"], session.get("user_id"), session.get("is_admin", False))
+
+        if not status:
+            return "Job not found.", True
+
+        return html.Div([
+            html.Progress(value=str(status["progress"]), max="100"),
+            html.Span(f" {status['message']}")
+        ]), status["finished"]
 
     @app.callback(
         Output("local-stock-chart", "figure"),
-        Input("local-stock-dropdown", "value")  # ✅ Handle multiple selections
+        Output("local-chart-etag", "data"),
+        Input("local-stock-dropdown", "value"),  # ✅ Handle multiple selections
+        Input("resolution-selector", "value"),
+        Input("time-range-dropdown", "value"),
+        Input("local-chart-view", "data"),
+        State("local-chart-etag", "data")
     )
-    def update_local_stock_chart(symbols):
-        """Update the plot when multiple stocks are selected."""
+    def update_local_stock_chart(symbols, resolution, time_range, view, etag):
+        """Update the plot when stocks, time range or the visible (zoomed) range change."""
         if not symbols:
-            return {"data": [], "layout": go.Layout(title="Select stocks to display data")}
+            return {"data": [], "layout": go.Layout(title="Select stocks to display data")}, None
+
+        x_range, width = None, None
+        if ctx.triggered_id == "local-chart-view":
+            x_range = parse_relayout_range(view.get("relayout"))
+            if x_range is RANGE_UNCHANGED:
+                return no_update, no_update
+            width = view.get("width")
+
+        if x_range:
+            start, end = pad_range(*x_range)
+            range_start = time_range_start(time_range)
+            if range_start:
+                start = max(start, pd.Timestamp(range_start))  # ✅ Never read past the selected range
+        else:
+            start, end = time_range_start(time_range), None  # ✅ Pushed into WHERE date >= ...
+
+        key = figure_key("local-stock-chart", [symbols, resolution, time_range, start, end, width], ["prices"])
+        if is_current(key, etag):
+            return no_update, no_update  # ✅ The browser already shows this exact figure
+        figure = cached_figure(
+            key, lambda: build_local_stock_figure(symbols, resolution, time_range, start, end, width)
+        )
+        return figure, key
 
-        stock_data = fetch_local_stock_data(symbols)
+    def build_local_stock_figure(symbols, resolution, time_range, start, end, width):
+        """Read, downsample and plot the selected symbols' closing prices."""
+        stock_data = fetch_local_stock_data(symbols, resolution=resolution or "auto", start=start, end=end)
 
         if not stock_data:
             return {"data": [], "layout": go.Layout(title="No data available")}
 
-        traces = []
+        series = []
         for symbol, df in stock_data.items():
             if not df.empty:
-                traces.append(go.Scatter(
-                    x=df["Date"],
-                    y=df["Close"],
-                    mode="lines",
-                    name=symbol
-                ))
+                x, y = downsample(df["Date"].to_numpy(), df["Close"].to_numpy(), points_for_width(width))
+                series.append((symbol, x, y))
 
         figure = {
-            "data": traces,
+            "data": line_traces(series),  # ✅ WebGL decided by the figure's total points
             "layout": go.Layout(
                 title="Stock Price Comparison",
-                xaxis={"title": "Date"},
+                xaxis={"title": "Date", "type": "date"},  # Dates are sent as epoch milliseconds
                 yaxis={"title": "Closing Price"},
-                hovermode="closest"
+                hovermode="closest",
+                uirevision=f"{','.join(symbols)}|{resolution}|{time_range}"  # ✅ Keep the zoom while re-querying
             )
         }
         return figure
@@ -298,30 +444,196 @@ def register_callbacks(app, server):
 
     @app.callback(
         Output("transactions-table", "data"),
-        Input("refresh-transactions-btn", "n_clicks")
+        Output("transactions-table", "page_count"),
+        Input("refresh-transactions-btn", "n_clicks"),
+        Input("transactions-table", "page_current"),
+        Input("transactions-table", "page_size"),
+        Input("transactions-table", "sort_by"),
+        Input("transactions-table", "filter_query")
     )
-    def refresh_transactions(n_clicks):
-        """Fetch transaction data for admins and users."""
+    def refresh_transactions(n_clicks, page_current, page_size, sort_by, filter_query):
+        """Fetch one page of transaction data for admins and users."""
         logging.info(f"User {session.get('username')} is fetching transaction data.")
 
-        df = get_transaction_data()
+        page_size = page_size or 10
+        records, total = get_transaction_page(page_current or 0, page_size, sort_by, filter_query)
+        return records, max(1, -(-total // page_size))  # ✅ Only the visible page is sent to the browser
 
-        return df.to_dict("records") if not df.empty else []
+    @app.callback(
+        Output("import-job-store", "data"),
+        Input("transactions-upload", "contents"),
+        State("transactions-upload", "filename"),
+        prevent_initial_call=True
+    )
+    def import_transactions(contents, filename):
+        """Queue the import of an uploaded Sparkasse CSV/XLSX export into the transaction table (admins only)."""
+        if not contents:
+            return no_update
+        if not session.get("user_id"):
+            return {"error": "Please log in to import bookings."}
+        if not session.get("is_admin"):
+            return {"error": "Access Denied: Only admins can import bookings."}  # ✅ The tables are shared
+        if not (filename or "").lower().endswith((".csv", ".txt", ".xlsx", ".xlsm")):
+            return {"error": "Please upload a CSV or XLSX account statement."}
+
+        table = transaction_table()
+        with server.app_context():
+            error = missing_migration(table)
+            if error:
+                return {"error": error}
+
+            logging.info(f"User {session.get('username')} is importing {filename} into {table}.")
+            job_id = submit_import_job(server, contents, filename, table, user_id=session.get("user_id"))
+        return {"job_id": job_id}
+
+    @app.callback(
+        Output("import-status", "children"),
+        Output("import-job-poll", "disabled"),
+        Input("import-job-store", "data"),
+        Input("import-job-poll", "n_intervals"),
+        prevent_initial_call=True
+    )
+    def poll_import_job(job_data, n_intervals):
+        """Show the progress of the current import job until it finishes."""
+        return render_job_status(job_data)
+
+    @app.callback(
+        Output("rules-table", "data"),
+        Output("rule-status", "children"),
+        Input("add-rule-btn", "n_clicks"),
+        Input("rules-table", "data_previous"),
+        Input("suggestions-table", "data"),  # ✅ Reload once suggestions have been accepted
+        State("rules-table", "data"),
+        State("rule-category", "value"),
+        State("rule-kind", "value"),
+        State("rule-pattern", "value"),
+        State("rule-min-amount", "value"),
+        State("rule-max-amount", "value"),
+        State("rule-priority", "value")
+    )
+    def manage_rules(n_clicks, previous, suggestions, current, category, kind, pattern, min_amount, max_amount, priority):
+        """List categorization rules; admins can add rules or delete them from the table."""
+        status = no_update
+        if ctx.triggered_id in ("add-rule-btn", "rules-table") and not session.get("is_admin"):
+            status = "Access Denied: Only admins can edit categorization rules."
+
+        elif ctx.triggered_id == "add-rule-btn":
+            category, pattern = (category or "").strip(), (pattern or "").strip() or None
+            error = "Please enter a category." if not category else \
+                validate_rule(kind, pattern, min_amount, max_amount)
+            if error:
+                return no_update, error
+
+            with server.app_context():
+                db.session.add(CategoryRule(category=category[:50], kind=kind, pattern=pattern,
+                                            min_amount=min_amount, max_amount=max_amount,
+                                            priority=100 if priority is None else priority))
+                db.session.commit()
+            status = f"Rule for {category} added. Re-categorize to apply it to existing bookings."
+
+        elif ctx.triggered_id == "rules-table":
+            deleted = {row["id"] for row in previous or []} - {row["id"] for row in current or []}
+            if not deleted:
+                return no_update, no_update
+
+            with server.app_context():
+                CategoryRule.query.filter(CategoryRule.id.in_(deleted)).delete(synchronize_session=False)
+                db.session.commit()
+            status = f"Deleted {len(deleted)} rule(s)."
+
+        with server.app_context():
+            return rule_records(), status
+
+    @app.callback(
+        Output("suggestions-table", "data"),
+        Output("suggestions-table", "selected_rows"),
+        Output("suggestion-status", "children"),
+        Input("accept-suggestions-btn", "n_clicks"),
+        Input("dismiss-suggestions-btn", "n_clicks"),
+        Input("categorize-job-poll", "disabled"),  # ✅ Reload once a suggest job has finished
+        State("suggestions-table", "data"),
+        State("suggestions-table", "selected_rows")
+    )
+    def manage_suggestions(n_accept, n_dismiss, poll_disabled, rows, selected):
+        """List model-suggested rules for admins, who accept (turn into rules) or dismiss the selected ones."""
+        if not session.get("is_admin"):
+            denied = ctx.triggered_id in ("accept-suggestions-btn", "dismiss-suggestions-btn")
+            return [], [], "Access Denied: Only admins can edit categorization rules." if denied else no_update
+
+        status = no_update
+        if ctx.triggered_id in ("accept-suggestions-btn", "dismiss-suggestions-btn"):
+            ids = [rows[index]["id"] for index in selected or [] if index < len(rows or [])]
+            if not ids:
+                return no_update, no_update, "Please select suggestions first."
+
+            with server.app_context():
+                if ctx.triggered_id == "accept-suggestions-btn":
+                    status = f"Accepted {accept_suggestions(ids)} rule(s). " \
+                             f"Re-categorize to apply them to existing bookings."
+                else:
+                    status = f"Dismissed {dismiss_suggestions(ids)} suggestion(s)."
+
+        with server.app_context():
+            return suggestion_records(), [], status
+
+    @app.callback(
+        Output("categorize-job-store", "data"),
+        Output("categorize-status", "children", allow_duplicate=True),
+        Input("recategorize-btn", "n_clicks"),
+        Input("suggest-rules-btn", "n_clicks"),
+        prevent_initial_call=True
+    )
+    def recategorize_transactions(n_recategorize, n_suggest):
+        """Queue a bulk re-run of the rules, or model-suggested rules for uncategorized payees (admins only)."""
+        if not session.get("is_admin"):
+            return no_update, "Access Denied: Only admins can re-categorize bookings."  # ✅ Both rewrite the shared table
+
+        if ctx.triggered_id == "suggest-rules-btn":
+            with server.app_context():
+                job_id = submit_suggest_rules_job(server, transaction_table(), user_id=session.get("user_id"))
+            return {"job_id": job_id}, no_update
+
+        with server.app_context():
+            job_id = submit_recategorize_job(server, transaction_table(), user_id=session.get("user_id"))
+        return {"job_id": job_id}, no_update
+
+    @app.callback(
+        Output("categorize-status", "children"),
+        Output("categorize-job-poll", "disabled"),
+        Input("categorize-job-store", "data"),
+        Input("categorize-job-poll", "n_intervals"),
+        prevent_initial_call=True
+    )
+    def poll_categorize_job(job_data, n_intervals):
+        """Show the progress of the current re-categorize job until it finishes."""
+        return render_job_status(job_data)
 
     @app.callback(
         Output("line-chart", "figure"),
         Output("stacked-area-chart", "figure"),
         Output("stacked-bar-chart", "figure"),
         Output("pie-chart", "figure"),
-        Input("refresh-transactions-btn", "n_clicks")
+        Output("transaction-charts-etag", "data"),
+        Input("refresh-transactions-btn", "n_clicks"),
+        Input("transaction-granularity", "value"),
+        State("transaction-charts-etag", "data")
     )
-    def update_transaction_plots(n_clicks):
+    def update_transaction_plots(n_clicks, granularity, etag):
         """Update all transaction data visualizations."""
         logging.info("Updating transaction data visualizations.")
 
-        return (
-            generate_line_chart(),
-            generate_stacked_area_chart(),
-            generate_stacked_bar_chart(),
-            generate_pie_chart()
-        )
+        granularity = granularity or "month"
+        key = figure_key("transaction-charts", [granularity], [f"transactions:{transaction_table()}"])
+        if is_current(key, etag):
+            return no_update, no_update, no_update, no_update, no_update  # ✅ Nothing changed since the last render
+
+        def build():
+            agg = get_transaction_aggregates(granularity)  # ✅ One GROUP BY shared by all four charts
+            return (
+                generate_line_chart(agg),
+                generate_stacked_area_chart(agg),
+                generate_stacked_bar_chart(agg),
+                generate_pie_chart(agg)
+            )
+
+        return (*cached_figure(key, build), key)
@@ -0,0 +1,295 @@
+"""Rule-based bulk categorization of bookings.
+
+Rules (see models.CategoryRule) are checked in priority order and the first
+matching rule sets the category. All text rules are compiled into one regex
+per column: each rule becomes an anchored look-ahead alternative, so a
+single ``match`` per value returns the highest-priority rule that matches.
+Matching runs on the distinct payees / IBANs of a frame and is mapped back
+to the rows, which keeps it fast for years of bookings with recurring payees.
+"""
+import logging
+import re
+import time
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from database import db
+from llm_gateway import gateway
+from models import CategoryRule, RuleSuggestion
+
+RULE_KINDS = ("payee", "regex", "iban", "amount")
+RECATEGORIZE_BATCH_ROWS = 100000
+UNCATEGORIZED = "Uncategorized"
+SUGGEST_MAX_PAYEES = 200  # Most frequent uncategorized payees sent to the model per run
+SUGGESTED_RULE_PRIORITY = 1000  # Below hand-written rules (default 100), so those always win
+NO_MATCH = np.iinfo(np.int32).max
+# \1..\99 or (?P=name): inside the combined matcher these would point at other rules' groups
+_BACKREFERENCE = re.compile(r"(?:^|[^\\])(?:\\\\)*(?:\\[1-9]|\(\?P=)")
+
+
+def validate_rule(kind, pattern, min_amount=None, max_amount=None):
+    """Return an error message for an invalid rule definition, or None."""
+    if kind not in RULE_KINDS:
+        return f"Unknown rule type {kind!r}."
+    if kind != "amount" and not pattern:
+        return "Please enter a pattern."
+    if kind == "amount" and min_amount is None and max_amount is None:
+        return "Please enter a minimum and/or maximum amount."
+    if min_amount is not None and max_amount is not None and min_amount > max_amount:
+        return "The minimum amount must not exceed the maximum."
+    if kind == "regex":
+        try:
+            compiled = re.compile(pattern)
+        except re.error as e:
+            return f"Invalid regular expression: {e}"
+        if compiled.groupindex:
+            return "Named groups are not supported in rule patterns."
+        if _BACKREFERENCE.search(pattern):
+            return "Backreferences are not supported in rule patterns."
+        try:
+            re.compile(_wrapped(_alternative_pattern(kind, pattern), 0))
+        except re.error:
+            return "Inline flags must be scoped, e.g. (?i:...); matching is case-insensitive anyway."
+    return None
+
+
+def _alternative_pattern(kind, pattern):
+    """Anchored look-ahead that succeeds when the rule's pattern occurs in the value."""
+    if kind == "iban":
+        return re.escape(pattern.replace(" ", "").upper())
+    if kind == "payee":
+        return f"(?=.*?{re.escape(pattern)})"
+    return f"(?=.*?(?:{pattern}))"
+
+
+def _wrapped(alternative, position):
+    return f"{alternative}(?P<r{position}>)"
+
+
+def _combinable(rule):
+    """True when the rule can run as one alternative of the combined matcher.
+
+    Rules stored before validate_rule rejected global inline flags and
+    backreferences are matched on their own instead.
+    """
+    if rule.kind != "regex":
+        return True
+    if _BACKREFERENCE.search(rule.pattern):
+        return False
+    try:
+        re.compile(_wrapped(_alternative_pattern(rule.kind, rule.pattern), 0))
+    except re.error:
+        return False
+    return True
+
+
+class CompiledRules:
+    """A rule set compiled for vectorized matching over booking frames."""
+
+    def __init__(self, rules):
+        self.rules = sorted(rules, key=lambda rule: (rule.priority, rule.id or 0))
+        self.categories = np.array([rule.category for rule in self.rules] + [None], dtype=object)
+
+        # Text rules without an amount range go into one matcher per column; the rest become masks
+        payee, iban, self.masked = [], [], []
+        for position, rule in enumerate(self.rules):
+            ranged = rule.min_amount is not None or rule.max_amount is not None
+            if rule.kind == "amount" or ranged or not _combinable(rule):
+                self.masked.append((position, rule))
+            else:
+                (iban if rule.kind == "iban" else payee).append((position, rule))
+
+        self.payee_matcher = self._compile(payee)
+        self.iban_matcher = self._compile(iban)
+
+    @staticmethod
+    def _compile(indexed_rules):
+        if not indexed_rules:
+            return None
+        alternatives = "|".join(_wrapped(_alternative_pattern(rule.kind, rule.pattern), position)
+                                for position, rule in indexed_rules)
+        return re.compile(f"^(?:{alternatives})", re.IGNORECASE | re.DOTALL)
+
+    @staticmethod
+    def _first_match(matcher, values):
+        """Position of the first matching rule per value (NO_MATCH if none), via distinct values."""
+        codes, uniques = pd.factorize(values.astype("string").fillna(""), sort=False)
+        positions = np.full(len(uniques) + 1, NO_MATCH, dtype=np.int64)
+        for i, value in enumerate(uniques):
+            match = matcher.match(value)
+            if match:
+                positions[i] = int(match.lastgroup[1:])
+        return positions[codes]  # Code -1 (missing) lands on the trailing NO_MATCH
+
+    def _rule_mask(self, rule, frame):
+        mask = np.ones(len(frame), dtype=bool)
+        amounts = frame["Betrag"].astype(float).to_numpy()
+        if rule.min_amount is not None:
+            mask &= amounts >= float(rule.min_amount)
+        if rule.max_amount is not None:
+            mask &= amounts <= float(rule.max_amount)
+        if rule.kind == "amount":
+            return mask
+
+        column = "Kontonummer_IBAN" if rule.kind == "iban" else "Beguenstigter"
+        if rule.kind == "iban":
+            hits = frame[column].astype("string").str.replace(" ", "", regex=False).str.upper() \
+                .str.startswith(rule.pattern.replace(" ", "").upper())
+            return mask & hits.fillna(False).to_numpy(dtype=bool)
+
+        # Python's re (as in the combined matcher), not pandas' str.contains, which may run RE2 on Arrow strings
+        pattern = rule.pattern if rule.kind == "regex" else re.escape(rule.pattern)
+        try:
+            search = re.compile(pattern, re.IGNORECASE | re.DOTALL).search
+        except re.error as e:
+            logging.warning(f"Skipping category rule {rule.id} with invalid pattern {rule.pattern!r}: {e}")
+            return np.zeros(len(frame), dtype=bool)
+        codes, uniques = pd.factorize(frame[column].astype("string").fillna(""), sort=False)
+        found = np.array([search(value) is not None for value in uniques] + [False], dtype=bool)
+        return mask & found[codes]
+
+    def categorize(self, frame):
+        """Return the matched category per row (None where no rule matches)."""
+        best = np.full(len(frame), NO_MATCH, dtype=np.int64)
+        if self.payee_matcher is not None:
+            best = np.minimum(best, self._first_match(self.payee_matcher, frame["Beguenstigter"]))
+        if self.iban_matcher is not None:
+            ibans = frame["Kontonummer_IBAN"].astype("string").str.replace(" ", "", regex=False).str.upper()
+            best = np.minimum(best, self._first_match(self.iban_matcher, ibans))
+        for position, rule in self.masked:
+            best = np.where(self._rule_mask(rule, frame) & (position < best), position, best)
+
+        best[best == NO_MATCH] = len(self.rules)  # Trailing None category
+        return pd.Series(self.categories[best], index=frame.index, dtype=object)
+
+
+def rule_records():
+    """Stored rules as table rows, in the order they are applied."""
+    return [
+        {
+            "id": rule.id, "priority": rule.priority, "category": rule.category, "kind": rule.kind,
+            "pattern": rule.pattern,
+            "min_amount": float(rule.min_amount) if rule.min_amount is not None else None,
+            "max_amount": float(rule.max_amount) if rule.max_amount is not None else None,
+        }
+        for rule in CompiledRules(CategoryRule.query.all()).rules
+    ]
+
+
+def load_rules():
+    """Compile the stored rules (needs an app context)."""
+    return CompiledRules(CategoryRule.query.all())
+
+
+def apply_rules(frame, rules=None):
+    """Return ``frame`` with ``category`` set by the first matching rule; other rows keep theirs."""
+    rules = load_rules() if rules is None else rules
+    if frame.empty or not rules.rules:
+        return frame
+    matched = rules.categorize(frame)
+    return frame.assign(category=matched.where(matched.notna(), frame["category"]))
+
+
+def recategorize_table(table, progress=None):
+    """Re-apply the rules to every booking in ``table``, updating only rows whose category changes."""
+    rules = load_rules()
+    columns = ["transaction_id", "Beguenstigter", "Kontonummer_IBAN", "Betrag", "category"]
+    query = text(f"SELECT {', '.join(columns)} FROM {table} "
+                 f"WHERE transaction_id > :last_id ORDER BY transaction_id LIMIT {RECATEGORIZE_BATCH_ROWS}")
+    summary = {"checked": 0, "changed": 0}
+    started, last_id = time.perf_counter(), 0
+
+    while rules.rules:
+        frame = pd.DataFrame(db.session.execute(query, {"last_id": last_id}).fetchall(), columns=columns)
+        if frame.empty:
+            break
+        last_id = int(frame["transaction_id"].iloc[-1])
+
+        matched = rules.categorize(frame)
+        mask = matched.notna() & (matched != frame["category"])
+        changed = pd.DataFrame({"transaction_id": frame.loc[mask, "transaction_id"], "category": matched[mask]})
+        for category, ids in changed.groupby("category")["transaction_id"]:
+            ids = ids.tolist()
+            for start in range(0, len(ids), 1000):  # ✅ One UPDATE per category and 1000 ids
+                batch = ids[start:start + 1000]
+                db.session.execute(
+                    text(f"UPDATE {table} SET category = :category WHERE transaction_id IN "
+                         f"({', '.join(str(int(i)) for i in batch)})"),
+                    {"category": category}
+                )
+        db.session.commit()
+
+        summary["checked"] += len(frame)
+        summary["changed"] += len(changed)
+        if progress:
+            progress(f"Checked {summary['checked']} bookings, {summary['changed']} recategorized...")
+
+    summary["seconds"] = round(time.perf_counter() - started, 2)
+    logging.info(f"Recategorized {table}: {summary}")
+    return summary
+
+
+def suggest_rules(table, progress=None):
+    """Ask the chat model for a category per frequent uncategorized payee and store them for review.
+
+    Payees come from imported bank data, so they (and the model's answers)
+    are untrusted: suggestions are stored as RuleSuggestion rows and only
+    become rules when an admin accepts them (``accept_suggestions``).
+    """
+    known = {category for (category,) in db.session.execute(
+        text(f"SELECT DISTINCT category FROM {table} WHERE category IS NOT NULL AND category <> :uncategorized"),
+        {"uncategorized": UNCATEGORIZED}
+    )}
+    rules = CategoryRule.query.all()
+    known |= {rule.category for rule in rules}
+    covered = {rule.pattern.casefold() for rule in rules if rule.kind == "payee" and rule.pattern}
+    covered |= {pattern.casefold() for (pattern,) in db.session.query(RuleSuggestion.pattern)}  # Pending already
+
+    payees = [payee for payee in db.session.execute(
+        text(f"SELECT Beguenstigter FROM {table} WHERE (category IS NULL OR category = :uncategorized) "
+             f"AND Beguenstigter IS NOT NULL AND Beguenstigter <> '' "
+             f"GROUP BY Beguenstigter ORDER BY COUNT(*) DESC LIMIT {SUGGEST_MAX_PAYEES}"),
+        {"uncategorized": UNCATEGORIZED}
+    ).scalars() if payee.casefold() not in covered]
+
+    instruction = ("Each item is the payee of a booking on a German bank account. Give the spending "
+                   f"category for each, preferably one of: {', '.join(sorted(known)) or 'none defined yet'}. "
+                   "Answer with the category name only, or 'Unknown' if unsure.")
+    def on_batch(done, total):
+        if progress:
+            progress(f"Asked about {done} of {total} payees...", 100 * done // total)
+
+    answers = gateway.complete_batch(instruction, payees, on_batch=on_batch)  # ✅ One request per LLM_BATCH_SIZE
+    suggested = [(payee, answer.strip()[:50]) for payee, answer in zip(payees, answers)
+                 if answer.strip() and answer.strip().casefold() != "unknown"]
+
+    db.session.add_all(RuleSuggestion(category=category, pattern=payee[:255]) for payee, category in suggested)
+    db.session.commit()
+    logging.info(f"Suggested {len(suggested)} category rules for {len(payees)} payees of {table}.")
+    return {"payees": len(payees), "suggested": len(suggested)}
+
+
+def suggestion_records():
+    """Pending rule suggestions as table rows, by category."""
+    return [
+        {"id": suggestion.id, "category": suggestion.category, "pattern": suggestion.pattern}
+        for suggestion in RuleSuggestion.query.order_by(RuleSuggestion.category, RuleSuggestion.pattern)
+    ]
+
+
+def accept_suggestions(ids):
+    """Turn the given suggestions into low-priority payee rules; returns how many were added."""
+    accepted = RuleSuggestion.query.filter(RuleSuggestion.id.in_(ids)).all()
+    db.session.add_all(CategoryRule(category=suggestion.category, kind="payee", pattern=suggestion.pattern,
+                                    priority=SUGGESTED_RULE_PRIORITY) for suggestion in accepted)
+    for suggestion in accepted:
+        db.session.delete(suggestion)
+    db.session.commit()
+    return len(accepted)
+
+
+def dismiss_suggestions(ids):
+    """Delete the given suggestions; returns how many were removed."""
+    count = RuleSuggestion.query.filter(RuleSuggestion.id.in_(ids)).delete(synchronize_session=False)
+    db.session.commit()
+    return count
@@ -0,0 +1,123 @@
+"""Streaming chat with the OpenAI-compatible assistant.
+
+``POST /chat/stream`` relays the model's token deltas to the browser as
+server-sent events while they are generated, and stores the ChatMessage
+once the answer is complete. Answers to repeated prompts come from the
+shared chat_cache unless the message opts out; "use my data" questions get a
+compact summary of the user's prices and bookings (chat_context) as a system
+message. Model requests go through llm_gateway. The browser side lives in
+assets/chat_stream.js.
+"""
+import json
+import logging
+import time
+from datetime import datetime
+from flask import Blueprint, Response, jsonify, request, session, stream_with_context
+from config import CHAT_MODEL
+from chat_context import build_context, SYSTEM_PROMPT
+from chat_cache import response_key, cached_response, store_response, estimate_tokens, chat_cache
+from llm_gateway import gateway, GatewayBusy
+from database import db
+from models import ChatMessage
+from sqlalchemy import and_, or_
+
+CHAT_HISTORY_PAGE_SIZE = 10
+
+chat_bp = Blueprint("chat", __name__)
+
+
+def sse(event, data):
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def history_page(user_id, before=None, limit=CHAT_HISTORY_PAGE_SIZE):
+    """Up to ``limit`` messages of a user, newest first, older than the ``before`` cursor.
+
+    The cursor is the ``{"timestamp", "id"}`` of the oldest message shown so
+    far (see ``history_cursor``); the query walks ix_chat_message_user_timestamp
+    instead of counting an OFFSET of rows.
+    """
+    query = ChatMessage.query.filter(ChatMessage.user_id == user_id)
+    if before:
+        timestamp = datetime.fromisoformat(before["timestamp"])
+        query = query.filter(or_(
+            ChatMessage.timestamp < timestamp,
+            and_(ChatMessage.timestamp == timestamp, ChatMessage.id < before["id"])
+        ))
+    return query.order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc()).limit(limit).all()
+
+
+def history_cursor(message):
+    """Keyset cursor pointing just past ``message``."""
+    return {"timestamp": message.timestamp.isoformat(), "id": message.id}
+
+
+@chat_bp.route("/stream", methods=["POST"])
+def stream_chat():
+    """Answer a chat message as a stream of ``delta`` events followed by ``done`` (or ``error``)."""
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "Please log in to use chat."}), 401
+
+    body = request.get_json(silent=True) or {}
+    user_input = (body.get("message") or "").strip()
+    if not user_input:
+        return jsonify({"error": "Please enter a message."}), 400
+    use_cache = body.get("cache", True) is not False  # ✅ Per-message opt-out
+
+    messages = [{"role": "user", "content": user_input}]
+    context = None
+    if body.get("context"):
+        started = time.perf_counter()
+        context = build_context(user_input)
+        logging.info(f"Chat context of {len(context)} chars built in {(time.perf_counter() - started) * 1000:.1f}ms.")
+        if context:
+            messages.insert(0, {"role": "system", "content": SYSTEM_PROMPT + context})
+    key = response_key(user_input, CHAT_MODEL, context)
+
+    @stream_with_context
+    def generate():
+        started, first_token, parts, usage = time.perf_counter(), None, [], {}
+        cached = cached_response(key) if use_cache else None
+        if not use_cache:
+            chat_cache.record("bypass")
+
+        if cached is not None:
+            parts.append(cached["text"])
+            yield sse("delta", {"text": cached["text"]})
+        else:
+            try:
+                for delta in gateway.stream(messages, user_id, usage):
+                    if first_token is None:
+                        first_token = time.perf_counter() - started
+                    parts.append(delta)
+                    yield sse("delta", {"text": delta})
+            except GatewayBusy:
+                yield sse("error", {"message": "The assistant is busy right now, please try again in a moment."})
+                return
+            except Exception as e:
+                logging.exception("Chat completion failed.")
+                yield sse("error", {"message": f"Error: {e}"})
+                return
+
+        answer = "".join(parts)
+        elapsed_ms = round((time.perf_counter() - started) * 1000)
+        if cached is None and use_cache:
+            tokens = usage.get("total_tokens") or estimate_tokens(user_input) + estimate_tokens(answer)
+            store_response(key, answer, tokens, elapsed_ms)
+
+        chat_message = ChatMessage(user_id=user_id, user_message=user_input, bot_response=answer)
+        db.session.add(chat_message)
+        db.session.commit()  # ✅ Persist only complete answers
+
+        if cached is not None:
+            logging.info(f"Chat answer for user {user_id} from cache after {elapsed_ms}ms "
+                         f"(saved {cached['tokens']} tokens, {cached['model_ms']}ms).")
+        else:
+            logging.info(f"Chat answer for user {user_id}: first token after {(first_token or 0) * 1000:.0f}ms, "
+                         f"complete after {elapsed_ms}ms, {usage.get('total_tokens', '?')} tokens.")
+        yield sse("done", {"id": chat_message.id, "cached": cached is not None})
+
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})  # ✅ No proxy buffering
@@ -0,0 +1,69 @@
+"""Shared cache of chat assistant answers.
+
+Answers are keyed on the normalized prompt, the model and a hash of any data
+context sent along with it, so the same question about the same data is
+answered once and then served from the SQLite cache by every worker. Lookups
+are exact matches; entries expire after CHAT_CACHE_TTL_SECONDS and the least
+recently used ones are evicted beyond CHAT_CACHE_MAX_ENTRIES.
+
+Counters (see /cache_stats, namespace ``chat_responses``): ``hit``, ``miss``
+and ``bypass`` (per-message opt-out), ``saved_tokens`` and ``saved_ms`` (what
+the hits would have cost the model), ``spent_tokens`` and ``model_ms`` (what
+the misses did cost).
+"""
+import hashlib
+import json
+import re
+import time
+from cache import DiskCache
+from config import CHAT_CACHE_TTL_SECONDS, CHAT_CACHE_MAX_ENTRIES
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.]+$")
+
+chat_cache = DiskCache("chat_responses", max_entries=CHAT_CACHE_MAX_ENTRIES)
+
+
+def normalize_prompt(prompt):
+    """Case-, whitespace- and trailing-punctuation-insensitive form of a prompt."""
+    return _TRAILING_PUNCTUATION.sub("", _WHITESPACE.sub(" ", prompt).strip().casefold())
+
+
+def context_hash(context):
+    """Stable hash of the data context attached to a prompt ("" when there is none)."""
+    if not context:
+        return ""
+    return hashlib.sha256(json.dumps(context, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def response_key(prompt, model, context=None):
+    """Cache key of the answer to ``prompt`` from ``model`` given ``context``."""
+    return hashlib.sha256(
+        json.dumps([normalize_prompt(prompt), model, context_hash(context)]).encode("utf-8")
+    ).hexdigest()
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token) for servers that report no usage."""
+    return max(1, len(text) // 4)
+
+
+def cached_response(key):
+    """Return the cached answer dict (``text``, ``tokens``, ``model_ms``) for ``key``, or None."""
+    entry = chat_cache.get(key)
+    if entry is None or not entry.is_fresh:
+        chat_cache.record("miss")
+        return None
+
+    chat_cache.record("hit")
+    chat_cache.record("saved_tokens", entry.value["tokens"])
+    chat_cache.record("saved_ms", entry.value["model_ms"])
+    return entry.value
+
+
+def store_response(key, text, tokens, model_ms):
+    """Cache a complete answer and count what it cost."""
+    chat_cache.set(key, {"text": text, "tokens": tokens, "model_ms": model_ms},
+                   time.time() + CHAT_CACHE_TTL_SECONDS)
+    chat_cache.record("spent_tokens", tokens)
+    chat_cache.record("model_ms", model_ms)
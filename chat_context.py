@@ -0,0 +1,127 @@
+"""Compact summaries of the user's data for data-aware chat answers.
+
+Instead of pasting price or booking tables into prompts, the assistant gets
+a few precomputed lines: return and volatility per symbol, recent weekly
+closes and monthly spend per category. The lines are computed once per data
+version (see figure_cache.data_version) and kept in the shared cache for up
+to a day, so building a context for a question only picks cached lines until
+the token budget is used up. Symbols named in the question are included first.
+"""
+import logging
+import re
+import time
+import numpy as np
+import pandas as pd
+from cache import DiskCache
+from chat_cache import estimate_tokens
+from config import CHAT_CONTEXT_TOKEN_BUDGET
+from database import db
+from data_fetching import read_close_prices, get_transaction_aggregates, transaction_table
+from figure_cache import data_version
+from models import Stock, StockPrice
+from sqlalchemy import func
+
+TRADING_DAYS = {"1m": 21, "3m": 63, "1y": 252}
+STATS_LOOKBACK_DAYS = 400  # Calendar days of daily bars read for the one-year stats
+RECENT_WEEKS = 12
+SPEND_MONTHS = 12
+SUMMARY_TTL_SECONDS = 24 * 3600  # Safety net for data changed outside the app
+
+_summaries = DiskCache("chat_context", max_entries=20)  # Only a few sources; old data versions are evicted
+_SYMBOL_TOKEN = re.compile(r"[A-Z0-9][A-Z0-9.\-]{0,9}")
+
+SYSTEM_PROMPT = (
+    "You are the assistant of a stock and personal finance dashboard. "
+    "Use the summary of the user's data below where it helps to answer; "
+    "booking amounts are in EUR, negative amounts are spending.\n\n"
+)
+
+
+def _percent(value, sign="+"):
+    return "n/a" if value is None or np.isnan(value) else f"{value * 100:{sign}.1f}%"
+
+
+def build_price_summaries():
+    """Per-symbol stat and weekly-close lines, keyed by symbol."""
+    names = dict(db.session.query(Stock.symbol, Stock.name).all())
+    last_date = db.session.query(func.max(StockPrice.date)).scalar()
+    if not names or last_date is None:
+        return {}
+
+    start = pd.Timestamp(last_date) - pd.Timedelta(days=STATS_LOOKBACK_DAYS)
+    frame = read_close_prices(list(names), "D", start=start)
+    summaries = {}
+    for symbol, prices in frame.groupby("Symbol", sort=False):
+        closes = prices.set_index("Date")["Close"]
+        log_returns = np.log(closes).diff().dropna().iloc[-TRADING_DAYS["1y"]:]
+        returns = {
+            label: closes.iloc[-1] / closes.iloc[-days - 1] - 1 if len(closes) > days else None
+            for label, days in TRADING_DAYS.items()
+        }
+        volatility = log_returns.std() * np.sqrt(TRADING_DAYS["1y"]) if len(log_returns) > 1 else None
+        weekly = closes.resample("W-FRI").last().dropna().iloc[-RECENT_WEEKS:]
+
+        summaries[symbol] = [
+            f"{symbol} ({names[symbol]}): close {closes.iloc[-1]:.2f} on {closes.index[-1]:%Y-%m-%d}; "
+            f"return {', '.join(f'{label} {_percent(value)}' for label, value in returns.items())}; "
+            f"volatility {_percent(volatility, sign='')} p.a.",
+            f"{symbol} weekly closes since {weekly.index[0]:%Y-%m-%d}: "
+            f"{' '.join(f'{value:.2f}' for value in weekly)}",
+        ]
+    return summaries
+
+
+def build_spend_summaries():
+    """One line per month (newest first) with the booking total per category."""
+    monthly = get_transaction_aggregates("month")
+    if monthly.empty:
+        return []
+
+    lines = []
+    recent = sorted(monthly["period"].unique())[-SPEND_MONTHS:]
+    for period in reversed(recent):
+        month = monthly[monthly["period"] == period].sort_values("total")
+        totals = ", ".join(f"{category or 'Uncategorized'} {total:+.2f}"
+                           for category, total in zip(month["category"], month["total"]))
+        lines.append(f"Bookings {pd.Timestamp(period):%Y-%m}: {totals}")
+    return lines
+
+
+def _summary(name, version, build):
+    """Summary ``name`` at data ``version``, built at most once per version across workers."""
+    key = f"{name}:{version}"
+    entry = _summaries.get(key)
+    if entry is not None and entry.is_fresh:
+        _summaries.record("hit")
+        return entry.value
+
+    _summaries.record("miss")
+    started = time.perf_counter()
+    value = build()
+    _summaries.set(key, value, time.time() + SUMMARY_TTL_SECONDS)
+    logging.info(f"Built chat context summary {key} in {(time.perf_counter() - started) * 1000:.0f}ms.")
+    return value
+
+
+def build_context(prompt, budget=CHAT_CONTEXT_TOKEN_BUDGET):
+    """Data summary for ``prompt`` fitted into ``budget`` tokens ("" when there is no data).
+
+    Order of inclusion: stats and recent closes of symbols named in the
+    prompt, monthly spend (newest month first), then the other symbols' stats.
+    """
+    table = transaction_table()
+    prices = _summary("prices", data_version("prices"), build_price_summaries)
+    spend = _summary(f"spend:{table}", data_version(f"transactions:{table}"), build_spend_summaries)
+
+    named = [symbol for symbol in dict.fromkeys(_SYMBOL_TOKEN.findall(prompt.upper())) if symbol in prices]
+    candidates = [line for symbol in named for line in prices[symbol]] + spend
+    candidates += [lines[0] for symbol, lines in prices.items() if symbol not in named]
+
+    lines, used = [], 0
+    for line in candidates:
+        tokens = estimate_tokens(line) + 1
+        if used + tokens > budget:
+            break  # ✅ Keep priority order; don't skip ahead to shorter lines
+        lines.append(line)
+        used += tokens
+    return "\n".join(lines)
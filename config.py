@@ -26,6 +26,34 @@ DB_NAME = "dashboard_db"
 SQLALCHEMY_DATABASE_URI = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
 SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
 
+# Local cache shared by all app processes (provider responses, figures, ...)
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "cache.db"))
+
+# Optional Parquet copy of stock prices for fast chart reads (needs pyarrow)
+PRICE_STORE_DIR = os.getenv("PRICE_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "prices"))
+USE_PRICE_STORE = os.getenv("USE_PRICE_STORE", "1") == "1"
+
+# Chat assistant; point CHAT_API_BASE_URL at any OpenAI-compatible server (e.g. scripts/fake_openai_server.py)
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-4o-mini")
+CHAT_API_BASE_URL = os.getenv("CHAT_API_BASE_URL") or None
+# Outbound model requests (llm_gateway): in flight per worker process, timeouts and retries
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", "20"))  # Items per request for batched background prompts
+# Answers to identical prompts are shared between users and workers for this long
+CHAT_CACHE_TTL_SECONDS = int(os.getenv("CHAT_CACHE_TTL_SECONDS", str(24 * 3600)))
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "2000"))
+# Upper bound (estimated tokens) on the data summary attached to "use my data" questions
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "1500"))
+
+# Upper bound on points sent to the browser per chart trace
+CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "2000"))
+# Figures with at least this many points in total are drawn with WebGL (Scattergl) instead of SVG.
+# Keep it below CHART_MAX_POINTS or single-trace charts never reach it; Plotly Express also switches at 1000.
+WEBGL_MIN_POINTS = int(os.getenv("WEBGL_MIN_POINTS", "1000"))
+
 # Configure logging to also print to console
 # logging.basicConfig(
 #     filename="app.log",
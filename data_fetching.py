@@ -1,89 +1,253 @@
+import numpy as np
 import pandas as pd
 from alpha_vantage.timeseries import TimeSeries
 from config import apikeys
-from models import Stock, StockPrice, User
+from models import Stock, StockPrice, StockPriceRollup, FetchWatermark, User
 import yfinance as yf
-from database import db
+from database import db, bulk_upsert
+from cache import provider_cache, next_market_close
+from singleflight import SingleFlight
+import price_store
+from rollups import update_rollups, stocks_missing_rollups, choose_resolution
+from table_query import translate_filter, translate_sort
+from figure_cache import bump_data_version, data_version
 from decimal import Decimal
-from datetime import datetime
-from flask import session, current_app
-from sqlalchemy import text
+from datetime import date, datetime, timedelta
+from flask import session, current_app, has_request_context, g
+from sqlalchemy import text, func, select, type_coerce, String
 from yfinance.exceptions import YFRateLimitError
 import logging
+import threading
+import time
 
 av_api_key = apikeys["alpha_vantage"]
 
+PRICE_UPDATE_COLUMNS = ["open_price", "high_price", "low_price", "close_price", "volume"]
+INCREMENTAL_OVERLAP_DAYS = 5  # Re-fetch the last few days so revised bars get corrected
+
+provider_flight = SingleFlight(provider_cache)  # ✅ Coalesces identical in-flight provider calls
+
 def fetch_stock_data(symbol="AAPL"):
-    """Fetch stock data from Alpha Vantage API."""
-    ts = TimeSeries(key=av_api_key, output_format="pandas")
+    """Fetch stock data from Alpha Vantage API, served from the shared response cache.
+
+    Daily bars only change once per trading day, so responses stay fresh until
+    the next market close and are served stale while a refresh runs after that.
+    """
+    cache_key = f"alpha_vantage:TIME_SERIES_DAILY:{symbol}:full"
     try:
-        data, _ = ts.get_daily(symbol=symbol, outputsize="full")
-        data = data.rename(columns={"4. close": "Close"})
-        data.index = pd.to_datetime(data.index)
-        data = data.sort_index()
-        return data
+        return provider_cache.get_or_load(
+            cache_key,
+            lambda: provider_flight.do(
+                cache_key, lambda: _fetch_alpha_vantage_daily(symbol), expires_at=next_market_close
+            ),
+            expires_at=next_market_close
+        )
     except Exception as e:
         print(f"Error fetching stock data: {e}")
         return pd.DataFrame(columns=["Date", "Close"])
 
 
-def fetch_historical_stock_data(symbol):
-    """Fetch historical stock prices from Yahoo Finance if not already in database."""
+def _fetch_alpha_vantage_daily(symbol, outputsize="full"):
+    """Call Alpha Vantage for daily bars; raises on provider errors so they are never cached."""
+    ts = TimeSeries(key=av_api_key, output_format="pandas")
+    data, _ = ts.get_daily(symbol=symbol, outputsize=outputsize)
+    data = data.rename(columns={"4. close": "Close"})
+    data.index = pd.to_datetime(data.index)
+    return data.sort_index()
+
 
-    session["progress"] = f"Checking database for {symbol}..."
+def session_progress(message, percent=None):
+    """Default progress reporter: store the latest message in the Flask session."""
+    if has_request_context():
+        session["progress"] = message
 
-    stock_obj = Stock.query.filter_by(symbol=symbol).first()
 
-    if stock_obj:
-        latest_entry = db.session.execute(
-            text("SELECT MAX(date) FROM stock_price WHERE stock_id = :stock_id"),
-            {"stock_id": stock_obj.id}
-        ).scalar()
+def fetch_historical_stock_data(symbol, incremental=True, progress=session_progress):
+    """Fetch historical stock prices from Yahoo Finance.
 
-        if latest_entry:
-            session["progress"] = f"Data for {symbol} already exists up to {latest_entry}. Skipping fetch."
-            return
+    New symbols get their full history. Symbols already in the database are
+    refreshed from their stored high-water mark (minus a small overlap window so
+    revised bars are corrected) when ``incremental`` is set, otherwise skipped.
+    Progress is reported through ``progress(message, percent)``; a Yahoo
+    Finance rate limit is reported and then raised, so a job fails on it.
+    """
 
-    session["progress"] = f"Fetching historical data for {symbol}..."
+    progress(f"Checking database for {symbol}...", 5)
+
+    stock_obj, start_date, skip_reason = plan_history_fetch(symbol, incremental)
+    if skip_reason:
+        progress(skip_reason, 100)
+        return 0
+
+    if start_date:
+        progress(f"Fetching {symbol} bars since {start_date}...", 10)
+    else:
+        progress(f"Fetching historical data for {symbol}...", 10)
 
     try:
-        stock = yf.Ticker(symbol)
-        df = stock.history(period="max")
+        df, name = download_history(symbol, start_date, with_name=stock_obj is None)
 
         if df.empty:
-            session["progress"] = f"No data found for {symbol}."
-            return
+            progress(f"No data found for {symbol}.", 100)
+            return 0
 
     except YFRateLimitError:
-        session["progress"] = "Rate limit exceeded! Please wait and try again later."
+        progress("Rate limit exceeded! Please wait and try again later.")
         logging.warning("Yahoo Finance rate limit exceeded for fetching stock data.")
-        return  # Stop processing
+        raise
+
+    return store_history(symbol, df, stock_obj, name, incremental=start_date is not None, progress=progress)
+
+
+def plan_history_fetch(symbol, incremental=True):
+    """Decide what to fetch for a symbol.
+
+    Returns ``(stock_obj, start_date, skip_reason)``: ``stock_obj`` is None for
+    unknown symbols, ``start_date`` is None for a full-history fetch and
+    ``skip_reason`` is set when nothing needs fetching.
+    """
+    stock_obj = Stock.query.filter_by(symbol=symbol).first()
+    if not stock_obj:
+        return None, None, None
+
+    latest_entry = get_price_high_water_mark(stock_obj.id)
+    if not latest_entry:
+        return stock_obj, None, None
+
+    if not incremental:
+        return stock_obj, None, f"Data for {symbol} already exists up to {latest_entry}. Skipping fetch."
+
+    if latest_entry >= date.today():
+        return stock_obj, None, f"Data for {symbol} is already up to date ({latest_entry})."
+
+    return stock_obj, latest_entry - timedelta(days=INCREMENTAL_OVERLAP_DAYS), None
+
+
+def download_history(symbol, start_date=None, with_name=False):
+    """Download daily bars (and optionally the company name) from Yahoo Finance.
+
+    Touches no database state, so it is safe to call from worker threads.
+    Concurrent identical downloads in this process share one provider call;
+    the frames are not written to the shared cache, since each symbol's
+    full history would pile up there under ever new start dates.
+    Raises ``YFRateLimitError`` when Yahoo throttles the request.
+    """
+    def download():
+        stock = yf.Ticker(symbol)
+        if start_date:
+            df = stock.history(start=start_date.isoformat())
+        else:
+            df = stock.history(period="max")
+
+        name = None
+        if with_name and not df.empty:
+            name = stock.info.get("longName", symbol)
+        return df, name
+
+    flight_key = f"yfinance:history:{symbol}:{start_date or 'max'}:{int(with_name)}"
+    return provider_flight.do(flight_key, download)
 
+
+def store_history(symbol, df, stock_obj=None, name=None, incremental=False, progress=session_progress):
+    """Bulk-write downloaded bars for a symbol, creating its Stock row if needed."""
+    stock_obj = stock_obj or Stock.query.filter_by(symbol=symbol).first()
     if not stock_obj:
-        stock_obj = Stock(symbol=symbol, name=stock.info.get("longName", symbol))
+        stock_obj = Stock(symbol=symbol, name=name or symbol)
         db.session.add(stock_obj)
         db.session.commit()
 
-    for date, row in df.iterrows():
-        volume = int(row["Volume"]) if row["Volume"] else None
-
-        existing_entry = StockPrice.query.filter_by(stock_id=stock_obj.id, date=date.date()).first()
-        if existing_entry:
-            continue
-
-        price = StockPrice(
-            stock_id=stock_obj.id,
-            date=date.date(),
-            open_price=row["Open"],
-            high_price=row["High"],
-            low_price=row["Low"],
-            close_price=row["Close"],
-            volume=volume
-        )
-        db.session.add(price)
-
+    rows = price_frame_to_records(df, stock_obj.id)
+
+    progress(f"Writing {len(rows)} rows for {symbol}...", 50)
+    started = time.perf_counter()
+    written = bulk_upsert(
+        StockPrice, rows, ["stock_id", "date"], PRICE_UPDATE_COLUMNS,
+        on_chunk=lambda done, total: progress(f"Writing {symbol}: {done}/{total} rows...", 50 + 45 * done // total)
+    )
+    elapsed = time.perf_counter() - started
+    update_fetch_watermark(stock_obj.id, rows)
+    sync_price_store(stock_obj, rows)  # After bulk_upsert's commit, so the copy never gets ahead of SQL
+    if rows:
+        # A stock without (complete) rollups gets all its periods built, not just the recent ones
+        since = None if stocks_missing_rollups(stock_obj.id) else min(row["date"] for row in rows)
+        update_rollups(stock_obj.id, since=since)
+        bump_data_version("prices")  # ✅ Cached price charts are rebuilt on next view
+
+    rate = written / elapsed if elapsed > 0 else float(written)
+    mode = "incremental" if incremental else "full"
+    logging.info(f"Bulk ingest {symbol} ({mode}): {written} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+    progress(
+        f"Historical data for {symbol} inserted successfully! "
+        f"({written} rows, {mode}, {elapsed:.2f}s, {rate:,.0f} rows/s)",
+        100
+    )
+    return written
+
+
+def sync_price_store(stock_obj, rows):
+    """Merge newly stored bars into the symbol's Parquet file, seeding it from SQL when it is incomplete.
+
+    A file that is missing, or starts later than the SQL history (e.g. one
+    created from an incremental fetch), is rebuilt from the database, since
+    daily chart reads prefer the file over SQL.
+    """
+    if not price_store.enabled() or not rows:
+        return
+
+    first_stored = db.session.query(func.min(StockPrice.date)).filter(StockPrice.stock_id == stock_obj.id).scalar()
+    first_in_file = price_store.first_date(stock_obj.symbol)
+    if first_in_file is None or (first_stored is not None and first_in_file > first_stored):
+        price_store.rebuild_from_database(stock_obj.symbol)
+    else:
+        price_store.write_prices(stock_obj.symbol, rows)
+
+
+def get_price_high_water_mark(stock_id):
+    """Return the newest stored bar date for a stock, preferring the recorded watermark."""
+    watermark = db.session.get(FetchWatermark, stock_id)
+    if watermark and watermark.last_bar_date:
+        return watermark.last_bar_date
+
+    return db.session.execute(
+        text("SELECT MAX(date) FROM stock_price WHERE stock_id = :stock_id"),
+        {"stock_id": stock_id}
+    ).scalar()
+
+
+def update_fetch_watermark(stock_id, rows):
+    """Record when a stock was last fetched and the newest bar stored for it."""
+    watermark = db.session.get(FetchWatermark, stock_id) or FetchWatermark(stock_id=stock_id)
+
+    newest = max((row["date"] for row in rows), default=None)
+    if newest and (not watermark.last_bar_date or newest > watermark.last_bar_date):
+        watermark.last_bar_date = newest
+
+    watermark.last_fetched_at = datetime.utcnow()
+    watermark.rows_fetched = len(rows)
+    db.session.add(watermark)
     db.session.commit()
-    session["progress"] = f"Historical data for {symbol} inserted successfully!"
+
+
+def price_frame_to_records(df, stock_id):
+    """Convert a yfinance history frame into StockPrice row dicts, column by column."""
+    if df.empty:
+        return []
+
+    volume = df["Volume"].where(df["Volume"] > 0)  # ✅ 0 volume is stored as NULL, as before
+    frame = pd.DataFrame({
+        "stock_id": stock_id,
+        "date": pd.DatetimeIndex(df.index).date,
+        "open_price": df["Open"].to_numpy(dtype=float),
+        "high_price": df["High"].to_numpy(dtype=float),
+        "low_price": df["Low"].to_numpy(dtype=float),
+        "close_price": df["Close"].to_numpy(dtype=float),
+        "volume": pd.array(volume.round(), dtype="Int64"),
+    })
+    frame = frame.dropna(subset=["close_price"]).drop_duplicates(subset="date", keep="last")
+
+    # NaN / <NA> must reach the driver as NULL
+    frame = frame.astype(object).where(frame.notna(), None)
+    return frame.to_dict("records")
 
 
 def get_available_stocks():
@@ -96,27 +260,106 @@ def get_available_stocks():
     return stock_list
 
 
-def fetch_local_stock_data(symbols):
-    """Fetch stock price data from the database for the given symbols."""
+def fetch_local_stock_data(symbols, resolution="D", start=None, end=None):
+    """Fetch stock price data from the database for the given symbols.
+
+    ``resolution`` is "D" for daily bars, "W" / "M" for the weekly / monthly
+    rollups, or "auto" to pick one from the requested (or stored) date span.
+    ``start`` / ``end`` bound the read so only the visible range is loaded.
+    All symbols not served by the Parquet store are read with a single query.
+    """
     if not symbols:
         return {}
 
     with current_app.app_context():
-        stock_data = {}
-        for symbol in symbols:
-            stock_id = db.session.query(Stock.id).filter(Stock.symbol == symbol).scalar()
-
-            if not stock_id:
-                continue  # Skip if stock is not found
-
-            data = db.session.query(StockPrice.date, StockPrice.close_price) \
-                .filter(StockPrice.stock_id == stock_id) \
-                .order_by(StockPrice.date.asc()).all()
-
-            df = pd.DataFrame(data, columns=["Date", "Close"])
-            stock_data[symbol] = df  # ✅ Store each stock's data in a dictionary
+        if resolution == "auto":
+            if start is None or end is None:
+                first, last = get_price_span(symbols)
+                start_span, end_span = start or first, end or last
+            else:
+                start_span, end_span = start, end
+            resolution = choose_resolution(start_span, end_span)
 
-    return stock_data
+        stock_data = {}
+        if resolution == "D":
+            for symbol in symbols:
+                df = price_store.read_prices(symbol, start=start, end=end)
+                if df is not None:
+                    stock_data[symbol] = df.rename(columns={"date": "Date", "close_price": "Close"})
+
+        remaining = [symbol for symbol in symbols if symbol not in stock_data]
+        if remaining:
+            frame = read_close_prices(remaining, resolution, start, end)
+            if resolution != "D":
+                rolled_up = set(frame["Symbol"])
+                unrolled = [symbol for symbol in remaining if symbol not in rolled_up]
+                if unrolled:  # No rollups yet (backfill pending): daily bars are slower but complete
+                    frame = pd.concat([frame, read_close_prices(unrolled, "D", start, end)], ignore_index=True)
+            # Rows arrive grouped by stock, so split on the boundaries instead of a groupby
+            labels = frame["Symbol"].to_numpy()
+            starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]]) if len(labels) else []
+            ends = list(starts[1:]) + [len(labels)]
+            values = frame[["Date", "Close"]]
+            for first_row, end_row in zip(starts, ends):
+                stock_data[labels[first_row]] = values.iloc[first_row:end_row].reset_index(drop=True)
+
+    # ✅ Keep the caller's symbol order; unknown symbols are skipped
+    return {symbol: stock_data[symbol] for symbol in symbols if symbol in stock_data}
+
+
+def read_close_prices(symbols, resolution, start=None, end=None):
+    """Read (Symbol, Date, Close) for many symbols in one SQL query into a typed frame (needs an app context).
+
+    Unlike ``fetch_local_stock_data`` this always reads the database, never
+    the Parquet store, and returns one long frame sorted by stock and date.
+    """
+    if resolution == "D":
+        table, date_col = StockPrice, StockPrice.date
+        conditions = []
+    else:
+        table, date_col = StockPriceRollup, StockPriceRollup.period_start
+        conditions = [StockPriceRollup.resolution == resolution]
+
+    if start is not None:
+        conditions.append(date_col >= pd.Timestamp(start).date())
+    if end is not None:
+        conditions.append(date_col <= pd.Timestamp(end).date())
+
+    # type_coerce skips SQLAlchemy's per-row date conversion; pandas parses the whole column at once
+    query = select(Stock.symbol.label("Symbol"), type_coerce(date_col, String).label("Date"),
+                   table.close_price.label("Close")) \
+        .join(Stock, Stock.id == table.stock_id) \
+        .where(Stock.symbol.in_(symbols), *conditions) \
+        .order_by(table.stock_id, date_col)  # ✅ Walks the (stock_id, date) index
+
+    frame = pd.read_sql(query, db.session.connection(), dtype={"Close": "float64"})
+    frame["Date"] = pd.to_datetime(frame["Date"])
+    return frame
+
+
+TIME_RANGE_OFFSETS = {
+    "7d": pd.DateOffset(days=7),
+    "1m": pd.DateOffset(months=1),
+    "3m": pd.DateOffset(months=3),
+    "6m": pd.DateOffset(months=6),
+    "1y": pd.DateOffset(years=1),
+    "5y": pd.DateOffset(years=5),
+}
+
+
+def time_range_start(time_range, today=None):
+    """Return the first date covered by a TIME_RANGE_OPTIONS key, or None for "max"."""
+    offset = TIME_RANGE_OFFSETS.get(time_range)
+    if offset is None:
+        return None
+    return (pd.Timestamp(today or date.today()) - offset).date()
+
+
+def get_price_span(symbols):
+    """Return the first and last stored bar dates across the given symbols."""
+    return db.session.query(func.min(StockPrice.date), func.max(StockPrice.date)) \
+        .join(Stock, Stock.id == StockPrice.stock_id) \
+        .filter(Stock.symbol.in_(symbols)).one()
 
 
 def get_available_stocks():
@@ -144,21 +387,159 @@ def get_all_accounts():
 
     return pd.DataFrame(data)  # ✅ Convert to DataFrame for easy Dash integration
 
+TRANSACTION_CACHE_TTL_SECONDS = 30  # Shared by the table and chart callbacks of one refresh
+TRANSACTION_COLUMNS = [
+    "transaction_id", "Buchungstag", "Valutadatum", "Beguenstigter", "Kontonummer_IBAN", "Betrag", "category"
+]
+TRANSACTION_GRANULARITIES = {"day": "D", "week": "W-SUN", "month": "M"}  # Granularity -> pandas period
+
+# SQL expressions for the first day of a booking's period, per dialect
+PERIOD_SQL = {
+    "mysql": {
+        "day": "DATE(Buchungstag)",
+        "week": "DATE_SUB(DATE(Buchungstag), INTERVAL WEEKDAY(Buchungstag) DAY)",
+        "month": "DATE_FORMAT(Buchungstag, '%Y-%m-01')",
+    },
+    "sqlite": {
+        "day": "DATE(Buchungstag)",
+        "week": "DATE(Buchungstag, '-' || ((CAST(strftime('%w', Buchungstag) AS INTEGER) + 6) % 7) || ' days')",
+        "month": "strftime('%Y-%m-01', Buchungstag)",
+    },
+}
+
+_transaction_cache = {}  # (table, data version, kind, ...) -> (loaded_at, frame)
+_transaction_cache_lock = threading.Lock()
+
+
+def transaction_table():
+    """Name of the transaction table the current user may see."""
+    return "sparkasse" if session.get("is_admin") else "transactions"  # ✅ Admins see real data
+
+
+def _memoized(table, key, loader):
+    """Return ``loader()``'s frame, memoized per request (flask.g) and for a few seconds per key.
+
+    The table's shared data version (figure_cache.data_version) is the
+    authority on freshness: it is part of every key, so once an import or
+    re-categorization in any worker bumps it, no process looks up an older
+    frame again. The local dicts are never cleared; entries of old versions
+    simply expire. The price is one read of the shared SQLite cache per call.
+    """
+    key = (table, data_version(f"transactions:{table}")) + key
+    request_frames = g.setdefault("transaction_frames", {}) if has_request_context() else {}
+    if key in request_frames:
+        return request_frames[key]
+
+    with _transaction_cache_lock:
+        cached = _transaction_cache.get(key)
+    if cached and time.monotonic() - cached[0] < TRANSACTION_CACHE_TTL_SECONDS:
+        request_frames[key] = cached[1]
+        return cached[1]
+
+    df = loader()
+    now = time.monotonic()
+    with _transaction_cache_lock:
+        for expired in [k for k, (loaded_at, _) in _transaction_cache.items()
+                        if now - loaded_at >= TRANSACTION_CACHE_TTL_SECONDS]:
+            del _transaction_cache[expired]  # ✅ One-off filters and old versions don't pile up
+        _transaction_cache[key] = (now, df)
+    request_frames[key] = df
+    return df
+
+
+def prepare_transaction_frame(df):
+    """Parse booking dates and sort once so every consumer can use the frame as-is."""
+    df["Buchungstag"] = pd.to_datetime(df["Buchungstag"])
+    return df.sort_values("Buchungstag", kind="stable").reset_index(drop=True)
+
+
 def get_transaction_data():
-    """Fetch transaction data based on user role."""
-    with current_app.app_context():
-        if session.get("is_admin"):
-            query = text("SELECT * FROM sparkasse")  # ✅ Admins see real data
-        else:
-            query = text("SELECT * FROM transactions")  # ✅ Regular users see sample data
+    """Fetch transaction data based on user role.
+
+    The prepared frame is memoized per request and for a few seconds per
+    table, so one refresh click runs one query however many callbacks need
+    it. Callers must treat the returned frame as read-only.
+    """
+    table = transaction_table()
+
+    def load():
+        with current_app.app_context():
+            transactions = db.session.execute(text(f"SELECT {', '.join(TRANSACTION_COLUMNS)} FROM {table}")).fetchall()
+
+        if not transactions:
+            return pd.DataFrame()  # ✅ Return empty DataFrame if no data found
+        return prepare_transaction_frame(pd.DataFrame(transactions, columns=TRANSACTION_COLUMNS))
 
-        transactions = db.session.execute(query).fetchall()
+    return _memoized(table, ("frame",), load)
+
+
+def get_transaction_aggregates(granularity="month"):
+    """Return per-period, per-category sums (columns period, category, total, count).
+
+    The GROUP BY runs in the database, so only periods x categories rows are
+    transferred; dialects without a period expression fall back to pandas.
+    """
+    table = transaction_table()
+
+    def load():
+        with current_app.app_context():
+            period_sql = PERIOD_SQL.get(db.engine.dialect.name, {}).get(granularity)
+            if period_sql:
+                query = text(
+                    f"SELECT {period_sql} AS period, category, SUM(Betrag) AS total, COUNT(*) AS count "
+                    f"FROM {table} GROUP BY period, category ORDER BY period"
+                )
+                rows = db.session.execute(query).fetchall()
+                df = pd.DataFrame(rows, columns=["period", "category", "total", "count"])
+                df["period"] = pd.to_datetime(df["period"])
+                df["total"] = df["total"].astype(float)
+                return df
+
+        logging.info(f"No SQL period expression for {granularity}, aggregating transactions in pandas.")
+        return aggregate_transaction_frame(get_transaction_data(), granularity)
+
+    return _memoized(table, ("aggregate", granularity), load)
+
+
+def aggregate_transaction_frame(df, granularity="month"):
+    """Pandas equivalent of the SQL aggregation for an already loaded frame."""
+    if df.empty:
+        return pd.DataFrame(columns=["period", "category", "total", "count"])
+
+    period = df["Buchungstag"].dt.to_period(TRANSACTION_GRANULARITIES[granularity]).dt.start_time
+    grouped = df.assign(period=period, Betrag=df["Betrag"].astype(float)) \
+        .groupby(["period", "category"], dropna=False)["Betrag"]
+    return grouped.agg(total="sum", count="size").reset_index().sort_values("period", kind="stable")
+
+
+def get_transaction_page(page_current=0, page_size=10, sort_by=None, filter_query=""):
+    """Return ``(records, total_rows)`` for one page of the transactions table.
+
+    Sorting, filtering and paging run in SQL (ORDER BY / WHERE / LIMIT-OFFSET),
+    so only ``page_size`` rows leave the database. The filtered row count is
+    memoized like the other transaction queries, so paging does not recount.
+    """
+    table = transaction_table()
+    where, params = translate_filter(filter_query, TRANSACTION_COLUMNS)
+    where_sql = f" WHERE {where}" if where else ""
+    order_sql = translate_sort(sort_by, TRANSACTION_COLUMNS, default=("Buchungstag", "transaction_id"))
+
+    def count():
+        with current_app.app_context():
+            total = db.session.execute(text(f"SELECT COUNT(*) FROM {table}{where_sql}"), params).scalar()
+        return pd.DataFrame({"total": [total]})
+
+    total = int(_memoized(table, ("count", where_sql, tuple(sorted(params.items()))), count)["total"].iloc[0])
+
+    with current_app.app_context():
+        rows = db.session.execute(
+            text(f"SELECT {', '.join(TRANSACTION_COLUMNS)} FROM {table}{where_sql} ORDER BY {order_sql} LIMIT :limit OFFSET :offset"),
+            {**params, "limit": page_size, "offset": page_current * page_size}
+        ).fetchall()
 
-    if not transactions:
-        return pd.DataFrame()  # ✅ Return empty DataFrame if no data found
+    return [dict(zip(TRANSACTION_COLUMNS, row)) for row in rows], total
 
-    df = pd.DataFrame(transactions, columns=[
-        "transaction_id", "Buchungstag", "Valutadatum", "Beguenstigter", "Kontonummer_IBAN", "Betrag", "category"
-    ])
 
-    return df
\ No newline at end of file
+def invalidate_transaction_cache(table):
+    """Mark ``table`` as changed, e.g. after an import; every worker reloads its frames and charts."""
+    bump_data_version(f"transactions:{table}")  # ✅ Memo keys carry the version, so this alone invalidates them
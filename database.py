@@ -1,8 +1,14 @@
+import logging
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect
 from config import SQLALCHEMY_DATABASE_URI
 
 db = SQLAlchemy()
 
+BULK_CHUNK_SIZE = 5000  # Rows per multi-row INSERT statement
+
+_verified_keys = set()  # (table, columns) known to have a unique key, checked once per process
+
 def init_db(app):
     """Initialize MySQL database with Flask app."""
     app.config["SQLALCHEMY_DATABASE_URI"] = SQLALCHEMY_DATABASE_URI
@@ -10,3 +16,81 @@ def init_db(app):
     db.init_app(app)
     with app.app_context():
         db.create_all()
+
+
+def require_unique_key(model, columns):
+    """Raise unless ``model``'s table has a primary key, unique constraint or unique index on ``columns``.
+
+    MySQL's ON DUPLICATE KEY UPDATE silently inserts duplicates without one,
+    e.g. on databases created before ``python migrations.py`` added it.
+    """
+    table, wanted = model.__table__.name, frozenset(columns)
+    if (table, wanted) in _verified_keys:
+        return
+
+    inspector = inspect(db.engine)
+    keys = [inspector.get_pk_constraint(table)["constrained_columns"]]
+    keys += [constraint["column_names"] for constraint in inspector.get_unique_constraints(table)]
+    keys += [index["column_names"] for index in inspector.get_indexes(table) if index["unique"]]
+    if wanted not in {frozenset(key) for key in keys}:
+        raise RuntimeError(f"{table} has no unique key on ({', '.join(columns)}), so upserts would insert "
+                           f"duplicates. Run `python migrations.py` first.")
+    _verified_keys.add((table, wanted))
+
+
+def _upsert_statement(model, rows, conflict_columns, update_columns):
+    """Build a multi-row INSERT that updates existing rows on a unique-key conflict (None if unsupported)."""
+    table = model.__table__
+    dialect = db.engine.dialect.name
+
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table).values(rows)
+        return stmt.on_duplicate_key_update({col: stmt.inserted[col] for col in update_columns})
+
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table).values(rows)
+        return stmt.on_conflict_do_update(
+            index_elements=conflict_columns,
+            set_={col: stmt.excluded[col] for col in update_columns}
+        )
+
+    return None
+
+
+def _merge_rows(model, rows, conflict_columns, update_columns):
+    """Portable per-row upsert for dialects without a native one: look up each row by its unique key."""
+    for row in rows:
+        existing = model.query.filter_by(**{col: row[col] for col in conflict_columns}).one_or_none()
+        if existing is None:
+            db.session.add(model(**row))  # Autoflushed before the next lookup, so in-chunk duplicates merge
+        else:
+            for col in update_columns:
+                setattr(existing, col, row[col])
+    db.session.flush()
+
+
+def bulk_upsert(model, rows, conflict_columns, update_columns, chunk_size=BULK_CHUNK_SIZE, on_chunk=None):
+    """Write rows in chunks of multi-row upserts; duplicates are resolved by the database."""
+    if not rows:
+        return 0
+
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        stmt = _upsert_statement(model, chunk, conflict_columns, update_columns)
+        if stmt is not None:
+            require_unique_key(model, conflict_columns)
+            db.session.execute(stmt)
+        else:
+            if start == 0:
+                logging.warning(f"No bulk upsert for the {db.engine.dialect.name} dialect, merging row by row.")
+            _merge_rows(model, chunk, conflict_columns, update_columns)
+        if on_chunk:
+            on_chunk(start + len(chunk), len(rows))
+
+    db.session.commit()
+    return len(rows)
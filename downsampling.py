@@ -0,0 +1,82 @@
+"""Server-side downsampling of chart series.
+
+Largest-Triangle-Three-Buckets keeps the visual shape of a line with a fixed
+number of points; the series' global minimum and maximum are always kept so
+peaks and troughs never disappear from the chart.
+"""
+import numpy as np
+import pandas as pd
+from config import CHART_MAX_POINTS
+
+POINTS_PER_PIXEL = 2  # Two points per horizontal pixel are visually lossless for a line
+MIN_POINTS = 200
+
+
+def points_for_width(width):
+    """Number of points worth sending for a graph ``width`` pixels wide."""
+    if not width:
+        return CHART_MAX_POINTS
+    return max(MIN_POINTS, int(width * POINTS_PER_PIXEL))
+
+
+def _as_float(x):
+    """Numeric view of an x axis (datetimes become epoch nanoseconds)."""
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ns]").astype(np.int64).astype(np.float64)
+    if x.dtype == object:
+        return pd.to_datetime(x).asi8.astype(np.float64)
+    return x.astype(np.float64)
+
+
+def lttb_indices(x, y, n_out):
+    """Return the indices LTTB selects to represent ``(x, y)`` with ``n_out`` points."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = _as_float(x)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Bucket edges for the n - 2 interior points; first and last are always kept
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    # Average point of every bucket, computed at once; each step looks one bucket ahead
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts
+    avg_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts
+    avg_x = np.append(avg_x[1:], x[-1])
+    avg_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Twice the triangle area (a, candidate, next bucket average) for the whole bucket
+        areas = np.abs(
+            (x[a] - avg_x[i]) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y[i] - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample(x, y, max_points=CHART_MAX_POINTS):
+    """Reduce a series to at most ~``max_points`` points, preserving shape and extremes.
+
+    Returns ``(x, y)`` as numpy arrays; short series are returned unchanged.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+
+    valid = ~np.isnan(y)
+    if not valid.all():
+        x, y = x[valid], y[valid]
+
+    if not max_points or len(y) <= max_points:
+        return x, y
+
+    indices = lttb_indices(x, y, max_points - 2)
+    indices = np.union1d(indices, [np.argmin(y), np.argmax(y)])  # ✅ Never drop the extremes
+    return x[indices], y[indices]
+
@@ -0,0 +1,73 @@
+"""Shared cache of built Plotly figures, keyed by chart, parameters and data version.
+
+Writers (price ingestion, statement import, re-categorization) bump the
+version of the data source they changed; a figure built from an older
+version is then simply never looked up again and ages out of the LRU.
+Figures are stored as JSON in the shared SQLite cache, so every worker
+process reuses a figure built by any other.
+"""
+import json
+import logging
+import time
+from plotly.utils import PlotlyJSONEncoder
+from cache import DiskCache
+
+FIGURE_CACHE_MAX_ENTRIES = 500
+FIGURE_CACHE_TTL_SECONDS = 24 * 3600  # Safety net for data changed outside the app
+NEVER = float("inf")
+
+figure_cache = DiskCache("figures", max_entries=FIGURE_CACHE_MAX_ENTRIES)
+_versions = DiskCache("data_version")
+
+
+def data_version(source):
+    """Current version of a data source such as ``prices`` or ``transactions:sparkasse``."""
+    entry = _versions.get(source)
+    return entry.value if entry is not None else 0
+
+
+def bump_data_version(source):
+    """Mark ``source`` as changed; figures built from it before are no longer served."""
+    _versions.set(source, time.time_ns(), NEVER)
+
+
+def figure_key(chart, params, sources):
+    """Cache key (also usable as an ETag) for a chart at the current data versions."""
+    versions = {source: data_version(source) for source in sources}
+    return json.dumps([chart, params, versions], sort_keys=True, default=str)
+
+
+def is_current(key, etag):
+    """True when the browser already shows the figure for ``key`` (its stored ETag matches)."""
+    if key != etag:
+        return False
+    figure_cache.record("not_modified")
+    return True
+
+
+def cached_figure(key, build):
+    """Return the figure (or tuple of figures) for ``key``, calling ``build()`` on a miss.
+
+    Hits return the stored JSON decoded to plain dicts; the build time they
+    saved is added to the cache's ``saved_ms`` counter.
+    """
+    entry = figure_cache.get(key)
+    if entry is not None and entry.is_fresh:
+        figure_cache.record("hit")
+        figure_cache.record("saved_ms", entry.value["build_ms"])
+        return json.loads(entry.value["figure"])
+
+    figure_cache.record("miss")
+    started = time.perf_counter()
+    figure = build()
+    build_ms = round((time.perf_counter() - started) * 1000)
+
+    try:
+        payload = json.dumps(figure, cls=PlotlyJSONEncoder)
+    except (TypeError, ValueError) as e:
+        logging.warning(f"Figure {key[:80]} is not JSON serializable, not caching it: {e}")
+        return figure
+
+    figure_cache.set(key, {"figure": payload, "build_ms": build_ms}, time.time() + FIGURE_CACHE_TTL_SECONDS)
+    figure_cache.record("build_ms", build_ms)
+    return figure
@@ -0,0 +1,19 @@
+# gunicorn wsgi:server picks this file up automatically.
+# Threaded workers: a streaming chat answer (/chat/stream) occupies one thread
+# for its duration instead of a whole sync worker process.
+worker_class = "gthread"
+workers = 2
+threads = 16
+timeout = 120
+
+
+def on_starting(server):
+    """Runs once in the master before any worker exists: fail jobs a previous run left unfinished."""
+    from flask import Flask
+    from database import init_db
+    from jobs import fail_interrupted_jobs
+
+    app = Flask(__name__)
+    init_db(app)
+    with app.app_context():
+        fail_interrupted_jobs()
@@ -0,0 +1,173 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import Blueprint, jsonify, session
+from sqlalchemy import update
+from sqlalchemy.exc import SQLAlchemyError
+from database import db
+from models import BackgroundJob
+from data_fetching import fetch_historical_stock_data, invalidate_transaction_cache
+from batch_ingest import fetch_symbols_batch
+from transaction_import import import_upload, format_summary
+from categorizer import recategorize_table, suggest_rules
+
+JOB_WORKERS = 4  # Background threads per app process
+FINISHED_STATES = ("done", "failed")
+UNFINISHED_STATES = ("queued", "running")
+
+jobs_bp = Blueprint("jobs", __name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Create the worker pool lazily so each (forked) gunicorn worker gets its own threads."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+    return _executor
+
+
+def submit_job(app, kind, label, task, user_id=None):
+    """Persist a job row, queue ``task(progress)`` on the worker pool and return the job id."""
+    job = BackgroundJob(kind=kind, label=label, status="queued", progress=0,
+                        message=f"Queued {kind} for {label}...", user_id=user_id)
+    db.session.add(job)
+    db.session.commit()
+
+    _get_executor().submit(_run_job, app, job.id, task)
+    logging.info(f"Queued {kind} job {job.id} for {label}.")
+    return job.id
+
+
+def submit_fetch_job(app, symbol, user_id=None):
+    """Queue a historical data fetch for one symbol."""
+    return submit_job(app, "fetch", symbol,
+                      lambda progress: fetch_historical_stock_data(symbol, progress=progress),
+                      user_id=user_id)
+
+
+def submit_batch_fetch_job(app, symbols, user_id=None):
+    """Queue a concurrent fetch of many symbols as a single job."""
+    label = f"{len(symbols)} symbols: {', '.join(symbols[:5])}{'...' if len(symbols) > 5 else ''}"
+    return submit_job(app, "batch", label[:255],
+                      lambda progress: fetch_symbols_batch(symbols, progress=progress),
+                      user_id=user_id)
+
+
+def submit_import_job(app, contents, filename, table, user_id=None):
+    """Queue a bank-statement import into ``table``; the final message summarizes it."""
+    def task(progress):
+        summary = import_upload(contents, filename, table, progress=progress)
+        invalidate_transaction_cache(table)
+        progress(format_summary(summary))
+
+    return submit_job(app, "import", f"{filename} -> {table}"[:255], task, user_id=user_id)
+
+
+def submit_recategorize_job(app, table, user_id=None):
+    """Queue a re-run of the categorization rules over every booking in ``table``."""
+    def task(progress):
+        summary = recategorize_table(table, progress=progress)
+        invalidate_transaction_cache(table)
+        progress(f"Recategorized {summary.get('changed', 0)} of {summary.get('checked', 0)} bookings "
+                 f"in {summary['seconds']}s.")
+
+    return submit_job(app, "categorize", table, task, user_id=user_id)
+
+
+def submit_suggest_rules_job(app, table, user_id=None):
+    """Queue model-suggested payee rules for the uncategorized bookings of ``table``, for an admin to review."""
+    def task(progress):
+        suggestions = suggest_rules(table, progress=progress)
+        progress(f"Suggested {suggestions['suggested']} rules for {suggestions['payees']} payees. "
+                 f"Accept the ones you agree with under Suggested Rules.")
+
+    return submit_job(app, "suggest", table, task, user_id=user_id)
+
+
+def _run_job(app, job_id, task):
+    """Execute a queued job inside its own app context, recording progress as it goes."""
+    with app.app_context():
+        try:
+            _update_job(job_id, status="running", started_at=datetime.utcnow())
+            task(lambda message, percent=None: _report_progress(job_id, message, percent))
+            _update_job(job_id, status="done", progress=100, finished_at=datetime.utcnow())
+        except Exception as e:
+            logging.exception(f"Background job {job_id} failed.")
+            db.session.rollback()
+            _update_job(job_id, status="failed", message=f"Error: {e}"[:255], finished_at=datetime.utcnow())
+        finally:
+            db.session.remove()
+
+
+def _update_job(job_id, **fields):
+    """Write job state changes straight away so other workers can poll them.
+
+    Uses its own connection and transaction: committing db.session here
+    would also commit whatever the job has written so far, e.g. half of a
+    bulk_upsert when called from its on_chunk progress hook.
+    """
+    fields = {key: value for key, value in fields.items() if value is not None}
+    if "message" in fields:
+        fields["message"] = fields["message"][:255]
+    with db.engine.begin() as connection:
+        connection.execute(update(BackgroundJob).where(BackgroundJob.id == job_id).values(**fields))
+
+
+def _report_progress(job_id, message, percent=None):
+    """Progress callback handed to job tasks; a failed progress write does not fail the job."""
+    try:
+        _update_job(job_id, message=message, progress=percent)
+    except SQLAlchemyError as e:
+        logging.warning(f"Could not record progress of job {job_id}: {e}")
+
+
+def fail_interrupted_jobs():
+    """Mark jobs a previous server run left queued or running as failed, so their pollers stop.
+
+    Call once before any worker starts taking jobs (gunicorn's on_starting,
+    or before ``server.run``); the thread pool does not survive a restart.
+    """
+    count = BackgroundJob.query.filter(BackgroundJob.status.in_(UNFINISHED_STATES)).update(
+        {"status": "failed", "message": "Interrupted by a server restart. Please start it again.",
+         "finished_at": datetime.utcnow()},
+        synchronize_session=False
+    )
+    db.session.commit()
+    if count:
+        logging.warning(f"Marked {count} interrupted background job(s) as failed.")
+    return count
+
+
+def get_job_status(job_id, user_id, is_admin=False):
+    """Return a job's current state as a plain dict, or None if it does not exist or is not the user's."""
+    job = db.session.get(BackgroundJob, job_id)
+    if not job or not (is_admin or (user_id is not None and job.user_id == user_id)):
+        return None  # ✅ Same answer for other users' jobs, so ids can't be probed
+
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "label": job.label,
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.message,
+        "finished": job.status in FINISHED_STATES,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+@jobs_bp.route("/<int:job_id>")
+def job_status(job_id):
+    """Job status endpoint for polling clients; users only see their own jobs."""
+    if not session.get("user_id"):
+        return jsonify({"error": "Please log in."}), 401
+    status = get_job_status(job_id, session["user_id"], session.get("is_admin", False))
+    if not status:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(status)
@@ -4,6 +4,17 @@ from dash import dcc, html, dash_table
 from data_fetching import get_available_stocks
 from flask import session
 
+# Time ranges for the comparison chart; bounds are applied in the price queries
+TIME_RANGE_OPTIONS = {
+    "7d": "Last 7 Days",
+    "1m": "Last 1 Month",
+    "3m": "Last 3 Months",
+    "6m": "Last 6 Months",
+    "1y": "Last 1 Year",
+    "5y": "Last 5 Years",
+    "max": "Max Available"
+}
+
 def get_navbar():
     """Return a dynamic navigation bar for users and admins."""
     user_id = session.get("user_id")
@@ -69,6 +80,7 @@ def get_layout():
 
             # Stock Chart
             dcc.Graph(id='stock-chart', className="graph-container"),
+            dcc.Store(id="stock-chart-view"),  # ✅ Visible range + width, re-queried on zoom
 
             # Local Stock Data Plot Section
             html.Div([
@@ -80,8 +92,28 @@ def get_layout():
                     className="dropdown",
                     multi=True  # ✅ Allow multiple selections
                 ),
+                dcc.Dropdown(
+                    id="time-range-dropdown",
+                    options=[{"label": v, "value": k} for k, v in TIME_RANGE_OPTIONS.items()],
+                    value="max",
+                    clearable=False,
+                    className="dropdown"
+                ),
+                dcc.RadioItems(
+                    id="resolution-selector",
+                    options=[
+                        {"label": "Auto", "value": "auto"},
+                        {"label": "Daily", "value": "D"},
+                        {"label": "Weekly", "value": "W"},
+                        {"label": "Monthly", "value": "M"}
+                    ],
+                    value="auto",  # ✅ Long ranges read the weekly/monthly rollups
+                    inline=True
+                ),
                 html.Button("Refresh Dropdown", id="refresh-dropdown-btn", n_clicks=0),
-                dcc.Graph(id="local-stock-chart")
+                dcc.Graph(id="local-stock-chart"),
+                dcc.Store(id="local-chart-view"),  # ✅ Visible range + width, re-queried on zoom
+                dcc.Store(id="local-chart-etag")  # Figure cache key of the chart currently shown
             ], className="plot-container"),
 
             # Stock Data Fetching Section
@@ -89,7 +121,16 @@ def get_layout():
                 html.H3("Download Historical Stock Data"),
                 dcc.Input(id="stock-input", type="text", placeholder="Enter Stock Symbol", className="input-field"),
                 html.Button("Fetch Data", id="fetch-button", className="fetch-button"),
-                html.Div(id="fetch-status", className="status-output")  # Output field for progress
+
+                # Batch fetch: a pasted list and/or a text/CSV file of symbols
+                dcc.Textarea(id="batch-symbols-input", placeholder="AAPL, MSFT, GOOGL ... (one batch job)",
+                             className="input-field"),
+                dcc.Upload(id="batch-symbols-upload", children=html.Div("Drop or select a symbol list file"),
+                           className="upload-area"),
+                html.Button("Fetch Batch", id="batch-fetch-button", className="fetch-button"),
+                html.Div(id="fetch-status", className="status-output"),  # Output field for progress
+                dcc.Store(id="fetch-job-store"),  # ✅ Id of the queued background fetch
+                dcc.Interval(id="fetch-job-poll", interval=1000, disabled=True)  # ✅ Polls job progress
             ], className="fetch-container"),
 
             # Chat Section
@@ -97,8 +138,23 @@ def get_layout():
                 html.H2("💬 AI Chat Assistant", className="chat-header"),
                 dcc.Input(id="chat-input", type="text", placeholder="Ask ChatGPT...", className="chat-input"),
                 html.Button("Send", id="send-button", className="send-button"),
-                html.Div(id="chat-response", className="chat-response"),
-                html.Div(id="chat-history", className="chat-history")
+                dcc.Checklist(
+                    id="chat-no-cache",
+                    options=[{"label": " Fresh answer (skip the answer cache)", "value": "skip"}],
+                    value=[],
+                    className="chat-options"
+                ),
+                dcc.Checklist(
+                    id="chat-use-data",
+                    options=[{"label": " Use my data (prices and bookings summary)", "value": "data"}],
+                    value=[],
+                    className="chat-options"
+                ),
+                html.Div(id="chat-response", className="chat-response"),  # ✅ Filled token by token
+                dcc.Store(id="chat-stream-done"),  # Set by assets/chat_stream.js when an answer is stored
+                html.Div(id="chat-history", className="chat-history"),  # ✅ Newest first, appended via Patch
+                html.Button("Load older messages", id="chat-load-older", className="load-older-button"),
+                dcc.Store(id="chat-history-cursor")  # Oldest message shown, for keyset paging
             ], className="chat-container"),
         ], className="content-container")
     ], id="main-container")
@@ -146,20 +202,111 @@ def get_accounts_layout():
                 {"name": "Betrag (€)", "id": "Betrag"},
                 {"name": "Category", "id": "category"}
             ],
+            page_current=0,
             page_size=10,
+            page_action="custom",  # ✅ Paging, sorting and filtering run in SQL (see get_transaction_page)
+            sort_action="custom",
+            sort_mode="multi",
+            sort_by=[],
+            filter_action="custom",
+            filter_query="",
             style_table={"overflowX": "auto"},
             style_cell={"textAlign": "left"},
         ),
 
         html.Button("Refresh Transactions", id="refresh-transactions-btn", n_clicks=0, className="refresh-button"),
 
+        # Bank statement import
+        dcc.Upload(
+            id="transactions-upload",
+            children=html.Div(["📥 Drag and drop or ", html.A("select a Sparkasse CSV/XLSX export")]),
+            className="upload-area",
+            multiple=False
+        ),
+        html.Div(id="import-status", className="status-output"),
+        dcc.Store(id="import-job-store"),
+        dcc.Interval(id="import-job-poll", interval=1000, disabled=True),
+
+        # Categorization rules (first matching rule by priority sets the category)
+        html.H3("🏷️ Categorization Rules"),
+        html.Div([
+            dcc.Input(id="rule-category", type="text", placeholder="Category", className="input-field"),
+            dcc.Dropdown(
+                id="rule-kind",
+                options=[
+                    {"label": "Payee contains", "value": "payee"},
+                    {"label": "Payee regex", "value": "regex"},
+                    {"label": "IBAN starts with", "value": "iban"},
+                    {"label": "Amount range only", "value": "amount"}
+                ],
+                value="payee",
+                clearable=False
+            ),
+            dcc.Input(id="rule-pattern", type="text", placeholder="Pattern", className="input-field"),
+            dcc.Input(id="rule-min-amount", type="number", placeholder="Min amount", className="input-field"),
+            dcc.Input(id="rule-max-amount", type="number", placeholder="Max amount", className="input-field"),
+            dcc.Input(id="rule-priority", type="number", value=100, placeholder="Priority", className="input-field"),
+            html.Button("Add Rule", id="add-rule-btn", n_clicks=0, className="update-button"),
+        ], className="rule-form"),
+        html.Div(id="rule-status", className="status-output"),
+        dash_table.DataTable(
+            id="rules-table",
+            columns=[
+                {"name": "Priority", "id": "priority"},
+                {"name": "Category", "id": "category"},
+                {"name": "Type", "id": "kind"},
+                {"name": "Pattern", "id": "pattern"},
+                {"name": "Min (€)", "id": "min_amount"},
+                {"name": "Max (€)", "id": "max_amount"}
+            ],
+            row_deletable=True,
+            page_size=10,
+            style_table={"overflowX": "auto"},
+            style_cell={"textAlign": "left"},
+        ),
+        html.Button("Re-categorize Transactions", id="recategorize-btn", n_clicks=0, className="refresh-button"),
+        html.Button("Suggest Rules for Uncategorized Payees", id="suggest-rules-btn", n_clicks=0,
+                    className="refresh-button"),
+        html.Div(id="categorize-status", className="status-output"),
+        dcc.Store(id="categorize-job-store"),
+        dcc.Interval(id="categorize-job-poll", interval=1000, disabled=True),
+
+        # Model-suggested rules stay inactive until an admin accepts them
+        html.H4("Suggested Rules"),
+        dash_table.DataTable(
+            id="suggestions-table",
+            columns=[
+                {"name": "Category", "id": "category"},
+                {"name": "Payee contains", "id": "pattern"}
+            ],
+            row_selectable="multi",
+            selected_rows=[],
+            page_size=10,
+            style_table={"overflowX": "auto"},
+            style_cell={"textAlign": "left"},
+        ),
+        html.Button("Accept Selected", id="accept-suggestions-btn", n_clicks=0, className="update-button"),
+        html.Button("Dismiss Selected", id="dismiss-suggestions-btn", n_clicks=0, className="refresh-button"),
+        html.Div(id="suggestion-status", className="status-output"),
+
         html.Hr(),
 
         # Transaction Plots
         html.H3("📈 Transaction Data Visualizations"),
+        dcc.RadioItems(
+            id="transaction-granularity",
+            options=[
+                {"label": "Daily", "value": "day"},
+                {"label": "Weekly", "value": "week"},
+                {"label": "Monthly", "value": "month"}
+            ],
+            value="month",
+            inline=True
+        ),
         dcc.Graph(id="line-chart"),
         dcc.Graph(id="stacked-area-chart"),
         dcc.Graph(id="stacked-bar-chart"),
         dcc.Graph(id="pie-chart"),
+        dcc.Store(id="transaction-charts-etag"),  # Figure cache key of the charts currently shown
 
     ])
@@ -0,0 +1,249 @@
+"""Single path for outbound calls to the OpenAI-compatible chat model.
+
+Every completion goes through ``gateway``, which
+- bounds the requests in flight per process (LLM_MAX_CONCURRENCY);
+- hands free slots to waiting users round-robin, so one user's burst (or a
+  background job, which queues as the user ``"batch"``) cannot starve the
+  others; callers that wait longer than LLM_QUEUE_TIMEOUT_SECONDS get
+  ``GatewayBusy``;
+- applies a request timeout and retries rate limits, timeouts and 5xx
+  answers with jittered exponential backoff (honouring Retry-After); the
+  slot is given back during the backoff and the retry queues again;
+- can pack many small non-interactive prompts into one request
+  (``complete_batch``).
+
+Counters are kept in the shared cache (namespace ``llm_gateway``); queue
+depth and recent latency percentiles of this process come from ``stats()``.
+Point CHAT_API_BASE_URL at scripts/fake_openai_server.py to exercise it
+locally.
+"""
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+import numpy as np
+import openai
+from openai import OpenAI
+from cache import DiskCache
+from config import (apikeys, CHAT_MODEL, CHAT_API_BASE_URL, LLM_MAX_CONCURRENCY, LLM_TIMEOUT_SECONDS,
+                    LLM_QUEUE_TIMEOUT_SECONDS, LLM_MAX_RETRIES, LLM_BATCH_SIZE)
+
+RETRY_BASE_SECONDS = 0.5
+RETRY_MAX_SECONDS = 20
+RECENT_SAMPLES = 500  # Latencies kept per process for the percentiles in stats()
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError,
+                    openai.InternalServerError)
+_JSON_ARRAY = re.compile(r"\[.*\]", re.DOTALL)
+
+
+class GatewayBusy(Exception):
+    """No request slot became free within the queue timeout."""
+
+
+class _Ticket:
+    """A caller waiting for a request slot."""
+
+    def __init__(self):
+        self.granted = threading.Event()
+
+
+class LLMGateway:
+    """Concurrency-limited, fairly queued, retrying client for chat completions."""
+
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY, timeout=LLM_TIMEOUT_SECONDS,
+                 queue_timeout=LLM_QUEUE_TIMEOUT_SECONDS, max_retries=LLM_MAX_RETRIES,
+                 model=CHAT_MODEL, base_url=CHAT_API_BASE_URL):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.model = model
+        self.base_url = base_url
+        self.metrics = DiskCache("llm_gateway")
+        self._client = None
+        self._lock = threading.Lock()
+        self._waiting = OrderedDict()  # user -> deque of tickets, in round-robin order
+        self._active = 0
+        self._latencies = deque(maxlen=RECENT_SAMPLES)
+        self._queue_waits = deque(maxlen=RECENT_SAMPLES)
+
+    @property
+    def client(self):
+        if self._client is None:
+            # Retries are done in _request (with jitter and fair re-queuing), not by the SDK
+            self._client = OpenAI(api_key=apikeys["chatgpt"], base_url=self.base_url,
+                                  timeout=self.timeout, max_retries=0)
+        return self._client
+
+    # Fair slot scheduling
+
+    def _dispatch(self):
+        """Grant free slots to the waiting users in turn (call with the lock held)."""
+        while self._active < self.max_concurrency and self._waiting:
+            user, tickets = self._waiting.popitem(last=False)
+            tickets.popleft().granted.set()
+            self._active += 1
+            if tickets:
+                self._waiting[user] = tickets  # ✅ Back of the line until every other user had a turn
+
+    @contextmanager
+    def slot(self, user):
+        """Hold one of the request slots, waiting for this user's turn if all are busy."""
+        ticket, started = _Ticket(), time.perf_counter()
+        with self._lock:
+            self._waiting.setdefault(user, deque()).append(ticket)
+            self._dispatch()
+
+        if not ticket.granted.wait(self.queue_timeout):
+            with self._lock:
+                if not ticket.granted.is_set():  # Not granted between the timeout and the lock
+                    tickets = self._waiting.get(user)
+                    tickets.remove(ticket)
+                    if not tickets:
+                        del self._waiting[user]
+                    self.metrics.record("rejected")
+                    raise GatewayBusy(f"No model request slot free after {self.queue_timeout}s.")
+
+        waited_ms = (time.perf_counter() - started) * 1000
+        self._queue_waits.append(waited_ms)
+        self.metrics.record("queue_ms", round(waited_ms))
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._dispatch()
+
+    # Requests
+
+    def _retry_delay(self, attempt, error):
+        retry_after = getattr(getattr(error, "response", None), "headers", {}).get("retry-after")
+        try:
+            if retry_after is not None:
+                return min(float(retry_after), RETRY_MAX_SECONDS)
+        except ValueError:
+            pass
+        return random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** attempt))  # ✅ Full jitter
+
+    def _observe(self, started):
+        latency_ms = (time.perf_counter() - started) * 1000
+        self._latencies.append(latency_ms)
+        self.metrics.record("latency_ms", round(latency_ms))
+
+    @contextmanager
+    def _request(self, user, **kwargs):
+        """Send ``chat.completions.create`` in one of the slots and yield the response while holding it.
+
+        A retryable failure gives the slot back for the backoff and queues the
+        retry behind the other waiting users, so a burst of 429s does not pin
+        every slot in sleeps.
+        """
+        for attempt in range(self.max_retries + 1):
+            with self.slot(user):
+                self.metrics.record("requests")
+                started = time.perf_counter()
+                try:
+                    response = self.client.chat.completions.create(model=self.model, **kwargs)
+                except RETRYABLE_ERRORS as e:
+                    if attempt == self.max_retries:
+                        self.metrics.record("failures")
+                        raise
+                    error = e
+                else:
+                    try:
+                        yield response
+                    finally:
+                        self._observe(started)
+                    return
+
+            delay = self._retry_delay(attempt, error)
+            self.metrics.record("retries")
+            logging.warning(f"Model request failed ({type(error).__name__}), retry {attempt + 1} in {delay:.1f}s.")
+            time.sleep(delay)
+
+    def complete(self, messages, user, **kwargs):
+        """Return the message text of a (non-streamed) completion."""
+        with self._request(user, messages=messages, **kwargs) as response:
+            return response.choices[0].message.content
+
+    def stream(self, messages, user, usage=None):
+        """Yield the text deltas of a streamed completion; the token usage is added to ``usage``.
+
+        The slot is held until the stream is exhausted or closed. Only opening
+        the stream is retried; an error after the first delta is raised.
+        """
+        with self._request(user, messages=messages, stream=True, stream_options={"include_usage": True}) as stream:
+            try:
+                for chunk in stream:
+                    if chunk.usage is not None and usage is not None:
+                        usage.update(chunk.usage.model_dump(include={"prompt_tokens", "completion_tokens",
+                                                                     "total_tokens"}))
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                stream.close()
+
+    def complete_batch(self, instruction, items, user="batch", batch_size=LLM_BATCH_SIZE, on_batch=None):
+        """Answer ``instruction`` for each of ``items`` with one request per ``batch_size`` items.
+
+        For non-interactive work (e.g. summaries or category suggestions for
+        many payees). Batches whose reply is not a JSON array of the right
+        length are answered item by item instead. ``on_batch(done, total)``
+        is called after each batch.
+        """
+        answers = []
+        for start in range(0, len(items), batch_size):
+            batch = [str(item) for item in items[start:start + batch_size]]
+            prompt = (f"{instruction}\nAnswer each numbered item. Reply with only a JSON array of "
+                      f"{len(batch)} strings, in item order.\n\n"
+                      + "\n".join(f"{number}. {item}" for number, item in enumerate(batch, 1)))
+            reply = self.complete([{"role": "user", "content": prompt}], user)
+            self.metrics.record("batch_requests")
+            self.metrics.record("batched_items", len(batch))
+
+            parsed = None
+            match = _JSON_ARRAY.search(reply or "")
+            try:
+                parsed = json.loads(match.group(0)) if match else None
+            except ValueError:
+                pass
+            if isinstance(parsed, list) and len(parsed) == len(batch):
+                answers += [str(answer) for answer in parsed]
+            else:
+                logging.warning(f"Batch reply did not match {len(batch)} items, answering them one by one.")
+                self.metrics.record("batch_fallbacks")
+                answers += [self.complete([{"role": "user", "content": f"{instruction}\n\n{item}"}], user)
+                            for item in batch]
+            if on_batch:
+                on_batch(len(answers), len(items))
+        return answers
+
+    def stats(self):
+        """Live queue state and recent latency percentiles of this process, plus the shared counters."""
+        with self._lock:
+            depth = sum(len(tickets) for tickets in self._waiting.values())
+            waiting_users = len(self._waiting)
+            active = self._active
+
+        def percentiles(samples):
+            if not samples:
+                return None
+            p50, p95 = np.percentile(list(samples), [50, 95])
+            return {"p50": round(p50, 1), "p95": round(p95, 1)}
+
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": active,
+            "queue_depth": depth,
+            "waiting_users": waiting_users,
+            "latency_ms": percentiles(self._latencies),
+            "queue_wait_ms": percentiles(self._queue_waits),
+            "counters": self.metrics.stats()["counts"],
+        }
+
+
+gateway = LLMGateway()  # ✅ One limiter per worker process
@@ -0,0 +1,171 @@
+"""Schema upgrades for existing databases.
+
+``db.create_all()`` only creates missing tables; it never adds indexes or
+constraints to tables that already exist. Run this once after upgrading:
+
+    python migrations.py
+"""
+import logging
+import time
+import pandas as pd
+from sqlalchemy import inspect, text
+from cache import provider_cache
+from database import db
+from models import ChatMessage, StockPrice, transaction_table_schema
+from rollups import backfill_rollups
+from transaction_import import HASH_COLUMNS, content_hashes
+
+TRANSACTION_TABLES = ("sparkasse", "transactions")
+# Index suffix -> columns; the booking date index also serves the default ORDER BY
+TRANSACTION_INDEXES = {
+    "buchungstag": ("Buchungstag", "transaction_id"),
+    "valutadatum": ("Valutadatum",),
+    "beguenstigter": ("Beguenstigter",),
+    "iban": ("Kontonummer_IBAN",),
+    "betrag": ("Betrag",),
+    "category": ("category",),
+}
+
+
+def _existing_index_names(table_name):
+    inspector = inspect(db.engine)
+    names = {index["name"] for index in inspector.get_indexes(table_name)}
+    names |= {constraint["name"] for constraint in inspector.get_unique_constraints(table_name)}
+    return names
+
+
+def dedupe_stock_prices():
+    """Delete duplicate (stock_id, date) rows, keeping the most recently inserted one."""
+    # The derived table lets MySQL delete from the table it is reading (error 1093 otherwise)
+    result = db.session.execute(text("""
+        DELETE FROM stock_price
+        WHERE id NOT IN (
+            SELECT id FROM (
+                SELECT MAX(id) AS id FROM stock_price GROUP BY stock_id, date
+            ) AS keep
+        )
+    """))
+    db.session.commit()
+    return result.rowcount
+
+
+def migrate_stock_price_indexes():
+    """Add the unique (stock_id, date) key and the covering read index to stock_price."""
+    existing = _existing_index_names("stock_price")
+
+    if "uq_stock_price_stock_date" not in existing:
+        started = time.perf_counter()
+        removed = dedupe_stock_prices()
+        logging.info(f"Removed {removed} duplicate stock_price rows in {time.perf_counter() - started:.1f}s.")
+
+        started = time.perf_counter()
+        db.session.execute(text("CREATE UNIQUE INDEX uq_stock_price_stock_date ON stock_price (stock_id, date)"))
+        db.session.commit()
+        logging.info(f"Created uq_stock_price_stock_date in {time.perf_counter() - started:.1f}s.")
+
+    for index in StockPrice.__table__.indexes:
+        if index.name not in existing:
+            started = time.perf_counter()
+            index.create(db.engine, checkfirst=True)
+            logging.info(f"Created {index.name} in {time.perf_counter() - started:.1f}s.")
+
+
+def migrate_chat_message_indexes():
+    """Add the (user_id, timestamp) index used to page through a user's chat history."""
+    existing = _existing_index_names("chat_message")
+    for index in ChatMessage.__table__.indexes:
+        if index.name not in existing:
+            started = time.perf_counter()
+            index.create(db.engine, checkfirst=True)
+            logging.info(f"Created {index.name} in {time.perf_counter() - started:.1f}s.")
+
+
+def migrate_transaction_indexes():
+    """Index the sortable/filterable transaction columns used by the paged table."""
+    tables = set(inspect(db.engine).get_table_names())
+    for table in TRANSACTION_TABLES:
+        if table not in tables:
+            continue
+
+        existing = _existing_index_names(table)
+        for name, columns in TRANSACTION_INDEXES.items():
+            index_name = f"ix_{table}_{name}"
+            if index_name in existing:
+                continue
+            started = time.perf_counter()
+            db.session.execute(text(f"CREATE INDEX {index_name} ON {table} ({', '.join(columns)})"))
+            db.session.commit()
+            logging.info(f"Created {index_name} in {time.perf_counter() - started:.1f}s.")
+
+
+def hash_existing_transactions(table):
+    """Hash existing bookings (in id order) so re-imported exports dedupe against them."""
+    started, seen, hashed, last_id = time.perf_counter(), {}, 0, 0
+    query = text(f"SELECT transaction_id, {', '.join(HASH_COLUMNS)} FROM {table} "
+                 f"WHERE transaction_id > :last_id ORDER BY transaction_id LIMIT 50000")
+    while True:  # Keyset batches, so no read cursor stays open while the updates run
+        frame = pd.DataFrame(db.session.execute(query, {"last_id": last_id}).fetchall(),
+                             columns=["transaction_id"] + HASH_COLUMNS)
+        if frame.empty:
+            break
+        last_id = int(frame["transaction_id"].iloc[-1])
+        frame["content_hash"] = content_hashes(frame, seen)
+        db.session.execute(
+            text(f"UPDATE {table} SET content_hash = :content_hash "
+                 f"WHERE transaction_id = :transaction_id AND content_hash IS NULL"),
+            frame[["transaction_id", "content_hash"]].to_dict("records")
+        )
+        db.session.commit()
+        hashed += len(frame)
+    logging.info(f"Hashed {hashed} {table} rows in {time.perf_counter() - started:.1f}s.")
+
+
+def migrate_transaction_tables():
+    """Create missing transaction tables and add the import dedup hash to existing ones."""
+    tables = set(inspect(db.engine).get_table_names())
+    for table in TRANSACTION_TABLES:
+        schema = transaction_table_schema(table)
+        if table not in tables:
+            schema.create(db.engine)
+            logging.info(f"Created table {table}.")
+            continue
+
+        columns = {column["name"] for column in inspect(db.engine).get_columns(table)}
+        if "content_hash" not in columns:
+            db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN content_hash VARCHAR(40) NULL"))
+            db.session.commit()
+
+        if db.session.execute(text(f"SELECT COUNT(*) FROM {table} WHERE content_hash IS NULL")).scalar():
+            hash_existing_transactions(table)
+
+        for index in schema.indexes:
+            if index.name not in _existing_index_names(table):
+                index.create(db.engine)
+                logging.info(f"Created {index.name}.")
+
+
+def purge_persisted_downloads():
+    """Drop the Yahoo Finance history frames older versions wrote to the shared cache (never read again)."""
+    removed = provider_cache.delete_prefix("yfinance:history:")
+    if removed:
+        logging.info(f"Removed {removed} cached Yahoo Finance downloads.")
+
+
+def run_migrations():
+    """Apply every schema upgrade; each step is a no-op when already applied."""
+    migrate_stock_price_indexes()
+    migrate_chat_message_indexes()
+    migrate_transaction_tables()
+    migrate_transaction_indexes()
+    backfill_rollups()
+    purge_persisted_downloads()
+
+
+if __name__ == "__main__":
+    from flask import Flask
+    from database import init_db
+
+    server = Flask(__name__)
+    init_db(server)
+    with server.app_context():
+        run_migrations()
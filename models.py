@@ -14,6 +14,9 @@ class User(UserMixin, db.Model):
 
 class ChatMessage(db.Model):
     """Stores chat messages per user."""
+    __table_args__ = (
+        db.Index("ix_chat_message_user_timestamp", "user_id", "timestamp", "id"),  # ✅ Keyset history pages
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     user_message = db.Column(db.Text, nullable=False)
@@ -35,6 +38,11 @@ class UserStock(db.Model):
 
 class StockPrice(db.Model):
     """Stores historical stock prices."""
+    __table_args__ = (
+        db.UniqueConstraint("stock_id", "date", name="uq_stock_price_stock_date"),  # ✅ Target of bulk upserts
+        db.Index("ix_stock_price_stock_date_close", "stock_id", "date", "close_price"),  # ✅ Covers chart reads
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     stock_id = db.Column(db.Integer, db.ForeignKey('stock.id'), nullable=False)
     date = db.Column(db.Date, nullable=False)
@@ -45,3 +53,84 @@ class StockPrice(db.Model):
     volume = db.Column(db.Integer, nullable=True)
 
     stock = db.relationship("Stock", backref="prices")
+
+
+class StockPriceRollup(db.Model):
+    """Stores weekly ("W") and monthly ("M") OHLCV bars aggregated from StockPrice."""
+    __table_args__ = (
+        db.UniqueConstraint("stock_id", "resolution", "period_start", name="uq_rollup_stock_resolution_period"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    stock_id = db.Column(db.Integer, db.ForeignKey('stock.id'), nullable=False)
+    resolution = db.Column(db.String(1), nullable=False)
+    period_start = db.Column(db.Date, nullable=False)  # Monday of the week / first of the month
+    open_price = db.Column(db.Float, nullable=True)
+    high_price = db.Column(db.Float, nullable=True)
+    low_price = db.Column(db.Float, nullable=True)
+    close_price = db.Column(db.Float, nullable=False)
+    volume = db.Column(db.BigInteger, nullable=True)
+
+
+class FetchWatermark(db.Model):
+    """Tracks how far each stock's price history has been fetched."""
+    stock_id = db.Column(db.Integer, db.ForeignKey('stock.id'), primary_key=True)
+    last_bar_date = db.Column(db.Date, nullable=True)  # Newest bar stored for the stock
+    last_fetched_at = db.Column(db.DateTime, default=datetime.utcnow)
+    rows_fetched = db.Column(db.Integer, default=0)  # Rows written by the last fetch
+
+    stock = db.relationship("Stock", backref=db.backref("watermark", uselist=False))
+
+
+class BackgroundJob(db.Model):
+    """Stores the state of work queued to the background job pool."""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(30), nullable=False)  # e.g. "fetch"
+    label = db.Column(db.String(255), nullable=False)  # What the job works on, e.g. the symbol
+    status = db.Column(db.String(20), nullable=False, default="queued")  # queued / running / done / failed
+    progress = db.Column(db.Integer, nullable=False, default=0)  # Percent complete
+    message = db.Column(db.String(255), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+
+class CategoryRule(db.Model):
+    """Rule that assigns a category to matching bookings (lowest priority number wins)."""
+    id = db.Column(db.Integer, primary_key=True)
+    category = db.Column(db.String(50), nullable=False)
+    kind = db.Column(db.String(10), nullable=False)  # payee (substring) / regex (on Beguenstigter) / iban (prefix) / amount
+    pattern = db.Column(db.String(255), nullable=True)  # Unused for amount-only rules
+    min_amount = db.Column(db.Numeric(12, 2), nullable=True)  # Optional inclusive amount range, any kind
+    max_amount = db.Column(db.Numeric(12, 2), nullable=True)
+    priority = db.Column(db.Integer, nullable=False, default=100)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class RuleSuggestion(db.Model):
+    """Payee rule proposed by the chat model; inactive until an admin accepts it as a CategoryRule."""
+    id = db.Column(db.Integer, primary_key=True)
+    category = db.Column(db.String(50), nullable=False)
+    pattern = db.Column(db.String(255), nullable=False)  # The payee, as a "payee contains" rule
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+def transaction_table_schema(name, metadata=None):
+    """Core definition of the ``sparkasse`` / ``transactions`` tables.
+
+    They are plain tables read with raw SQL rather than ORM models, so they
+    live in their own MetaData and are not touched by ``db.create_all()``.
+    """
+    return db.Table(
+        name, metadata if metadata is not None else db.MetaData(),
+        db.Column("transaction_id", db.Integer, primary_key=True, autoincrement=True),
+        db.Column("Buchungstag", db.Date, nullable=False),
+        db.Column("Valutadatum", db.Date, nullable=True),
+        db.Column("Beguenstigter", db.String(255), nullable=True),
+        db.Column("Kontonummer_IBAN", db.String(34), nullable=True),
+        db.Column("Betrag", db.Numeric(12, 2), nullable=False),
+        db.Column("category", db.String(50), nullable=True),
+        db.Column("content_hash", db.String(40), nullable=True),  # SHA-1 of the booking, see transaction_import
+        db.Index(f"ux_{name}_content_hash", "content_hash", unique=True),
+    )
@@ -1,52 +1,54 @@
 import plotly.express as px
 import plotly.graph_objs as go
 import pandas as pd
-from data_fetching import get_transaction_data
+from data_fetching import get_transaction_aggregates
+from traces import use_webgl
 
-def generate_line_chart():
+# Charts are built from per-period x category sums (see data_fetching.get_transaction_aggregates),
+# so their size depends on the number of periods and categories, not on the number of bookings.
+
+def generate_line_chart(agg=None, granularity="month"):
     """Generate a line chart for transaction amounts over time."""
-    df = get_transaction_data()
-    if df.empty:
+    agg = get_transaction_aggregates(granularity) if agg is None else agg
+    if agg.empty:
         return go.Figure()
 
-    df["Buchungstag"] = pd.to_datetime(df["Buchungstag"])
-    df = df.sort_values("Buchungstag")
-
-    fig = px.line(df, x="Buchungstag", y="Betrag", title="Transaction Amount Over Time", markers=True)
+    totals = agg.groupby("period", as_index=False)["total"].sum()
+    webgl = use_webgl(len(totals))
+    fig = px.line(totals, x="period", y="total", title="Transaction Amount Over Time",
+                  markers=not webgl, render_mode="webgl" if webgl else "svg",  # ✅ Markers only on short series
+                  labels={"period": "Buchungstag", "total": "Betrag"})
     return fig
 
-def generate_stacked_area_chart():
+def generate_stacked_area_chart(agg=None, granularity="month"):
     """Generate a stacked area chart for cumulative spending by category."""
-    df = get_transaction_data()
-    if df.empty:
+    agg = get_transaction_aggregates(granularity) if agg is None else agg
+    if agg.empty:
         return go.Figure()
 
-    df["Buchungstag"] = pd.to_datetime(df["Buchungstag"])
-    df = df.sort_values("Buchungstag")
-
-    fig = px.area(df, x="Buchungstag", y="Betrag", color="category",
-                  title="Cumulative Spending Over Time (Stacked Area)")
+    fig = px.area(agg, x="period", y="total", color="category",
+                  title="Cumulative Spending Over Time (Stacked Area)",
+                  labels={"period": "Buchungstag", "total": "Betrag"})
     return fig
 
-def generate_stacked_bar_chart():
+def generate_stacked_bar_chart(agg=None, granularity="month"):
     """Generate a stacked bar chart for spending by category over time."""
-    df = get_transaction_data()
-    if df.empty:
+    agg = get_transaction_aggregates(granularity) if agg is None else agg
+    if agg.empty:
         return go.Figure()
 
-    df["Buchungstag"] = pd.to_datetime(df["Buchungstag"])
-    df = df.sort_values("Buchungstag")
-
-    fig = px.bar(df, x="Buchungstag", y="Betrag", color="category",
+    fig = px.bar(agg, x="period", y="total", color="category",
                  title="Spending by Category Over Time (Stacked Bar)",
-                 barmode="stack")
+                 barmode="stack", labels={"period": "Buchungstag", "total": "Betrag"})
     return fig
 
-def generate_pie_chart():
+def generate_pie_chart(agg=None, granularity="month"):
     """Generate a pie chart for total spending distribution by category."""
-    df = get_transaction_data()
-    if df.empty:
+    agg = get_transaction_aggregates(granularity) if agg is None else agg
+    if agg.empty:
         return go.Figure()
 
-    fig = px.pie(df, names="category", values="Betrag", title="Spending Distribution by Category")
+    totals = agg.groupby("category", as_index=False, dropna=False)["total"].sum()
+    fig = px.pie(totals, names="category", values="total", title="Spending Distribution by Category",
+                 labels={"total": "Betrag"})
     return fig
@@ -0,0 +1,135 @@
+"""Columnar (Parquet) copy of StockPrice data for fast chart reads.
+
+One Parquet file per symbol, written by the ingestion path after the SQL
+upsert has been committed (a symbol's first file is seeded with its whole
+SQL history, never with just the newly fetched bars) and read with memory-mapping, column projection and date-range
+pruning. The SQL tables remain the system of record; readers fall back to
+them whenever a symbol has no file or pyarrow is not installed.
+
+    python price_store.py   # (re)build every symbol's file from the database
+"""
+import logging
+import os
+import threading
+import pandas as pd
+from config import PRICE_STORE_DIR, USE_PRICE_STORE
+from singleflight import FileLock
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Optional dependency
+    pa = pq = None
+
+ROW_GROUP_SIZE = 2048  # ~8 years of daily bars; row-group stats let date filters skip the rest
+
+SCHEMA = pa.schema([
+    ("date", pa.date32()),
+    ("open_price", pa.float64()),
+    ("high_price", pa.float64()),
+    ("low_price", pa.float64()),
+    ("close_price", pa.float64()),
+    ("volume", pa.int64()),
+]) if pa else None
+
+
+def enabled():
+    """True when the Parquet store is switched on and pyarrow is available."""
+    return USE_PRICE_STORE and pq is not None
+
+
+def _path(symbol):
+    return os.path.join(PRICE_STORE_DIR, f"{symbol}.parquet")
+
+
+def write_prices(symbol, rows):
+    """Merge StockPrice row dicts into the symbol's Parquet file (newer rows win)."""
+    if not enabled() or not rows:
+        return
+
+    frame = pd.DataFrame(rows, columns=SCHEMA.names)
+    path = _path(symbol)
+    os.makedirs(PRICE_STORE_DIR, exist_ok=True)
+
+    with FileLock(f"{path}.lock"):  # ✅ Serialize read-merge-write across workers
+        if os.path.exists(path):
+            existing = pq.read_table(path, memory_map=True).to_pandas()
+            frame = pd.concat([existing, frame], ignore_index=True)
+
+        frame["date"] = pd.to_datetime(frame["date"]).dt.date
+        frame["volume"] = pd.array(frame["volume"], dtype="Int64")  # ✅ NULL volumes stay null, not NaN floats
+        frame = frame.drop_duplicates(subset="date", keep="last").sort_values("date")
+        table = pa.Table.from_pandas(frame, schema=SCHEMA, preserve_index=False)
+
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        pq.write_table(table, tmp_path, row_group_size=ROW_GROUP_SIZE)
+        os.replace(tmp_path, path)  # ✅ Atomic swap, readers never see a partial file
+
+
+def first_date(symbol):
+    """Oldest date in a symbol's file, or None if it has none (read from the row-group statistics)."""
+    if not enabled() or not os.path.exists(_path(symbol)):
+        return None
+
+    try:
+        metadata = pq.ParquetFile(_path(symbol), memory_map=True).metadata
+    except (OSError, pa.ArrowInvalid):
+        return None
+    dates = [metadata.row_group(i).column(0).statistics for i in range(metadata.num_row_groups)]
+    return min((stats.min for stats in dates if stats is not None and stats.has_min_max), default=None)
+
+
+def read_prices(symbol, columns=("date", "close_price"), start=None, end=None):
+    """Read a symbol's prices as a DataFrame, or None if it has no Parquet file.
+
+    Only ``columns`` are read and row groups outside ``[start, end]`` are skipped.
+    """
+    if not enabled():
+        return None
+
+    path = _path(symbol)
+    if not os.path.exists(path):
+        return None
+
+    filters = []
+    if start is not None:
+        filters.append(("date", ">=", pd.Timestamp(start).date()))
+    if end is not None:
+        filters.append(("date", "<=", pd.Timestamp(end).date()))
+
+    try:
+        table = pq.read_table(path, columns=list(columns), filters=filters or None, memory_map=True)
+    except (OSError, pa.ArrowInvalid) as e:
+        logging.warning(f"Unreadable price store file for {symbol}, using SQL instead: {e}")
+        return None
+
+    return table.to_pandas(date_as_object=False, split_blocks=True, self_destruct=True)
+
+
+def rebuild_from_database(symbol=None):
+    """Write the file of ``symbol`` (default: every symbol) from the SQL tables (needs an app context)."""
+    from database import db
+    from models import Stock, StockPrice
+
+    stocks = Stock.query.filter_by(symbol=symbol).all() if symbol else Stock.query.all()
+    for stock in stocks:
+        rows = db.session.query(
+            StockPrice.date, StockPrice.open_price, StockPrice.high_price,
+            StockPrice.low_price, StockPrice.close_price, StockPrice.volume
+        ).filter(StockPrice.stock_id == stock.id).all()
+
+        path = _path(stock.symbol)
+        if os.path.exists(path):
+            os.remove(path)
+        write_prices(stock.symbol, [row._asdict() for row in rows])
+        logging.info(f"Rebuilt price store for {stock.symbol} ({len(rows)} rows).")
+
+
+if __name__ == "__main__":
+    from flask import Flask
+    from database import init_db
+
+    server = Flask(__name__)
+    init_db(server)
+    with server.app_context():
+        rebuild_from_database()
@@ -0,0 +1,108 @@
+"""Weekly and monthly OHLCV rollups built from StockPrice.
+
+Rollups are refreshed incrementally: after new daily bars are stored, only
+the periods from the first touched bar onwards are recomputed and upserted.
+"""
+import logging
+import pandas as pd
+from sqlalchemy import func
+from database import db, bulk_upsert
+from models import StockPrice, StockPriceRollup
+
+RESOLUTIONS = {"W": "W-SUN", "M": "M"}  # Rollup code -> pandas period (weeks run Monday..Sunday)
+ROLLUP_UPDATE_COLUMNS = ["open_price", "high_price", "low_price", "close_price", "volume"]
+
+# Auto resolution: the longest span (in days) each resolution is used for
+AUTO_DAILY_MAX_DAYS = 2 * 365
+AUTO_WEEKLY_MAX_DAYS = 10 * 365
+
+
+def period_start(day, resolution):
+    """Return the first day of the rollup period containing ``day``."""
+    return pd.Period(day, freq=RESOLUTIONS[resolution]).start_time.date()
+
+
+def build_rollup_rows(daily, stock_id, resolution):
+    """Aggregate a frame of daily bars (``date`` + price columns) into rollup row dicts."""
+    if daily.empty:
+        return []
+
+    daily = daily.assign(volume=pd.to_numeric(daily["volume"]))  # ✅ An all-NULL volume column arrives as objects
+    periods = pd.to_datetime(daily["date"]).dt.to_period(RESOLUTIONS[resolution]).dt.start_time.dt.date
+    grouped = daily.sort_values("date").groupby(periods.rename("period_start"), sort=True)
+    frame = pd.DataFrame({
+        "open_price": grouped["open_price"].first(),
+        "high_price": grouped["high_price"].max(),
+        "low_price": grouped["low_price"].min(),
+        "close_price": grouped["close_price"].last(),
+        "volume": grouped["volume"].sum(min_count=1),
+    }).reset_index()
+
+    frame["stock_id"] = stock_id
+    frame["resolution"] = resolution
+    frame["volume"] = pd.array(frame["volume"].round(), dtype="Int64")
+    frame = frame.astype(object).where(frame.notna(), None)
+    return frame.to_dict("records")
+
+
+def update_rollups(stock_id, since=None):
+    """Recompute every rollup period of a stock that contains a bar on or after ``since``."""
+    if since is not None:
+        since = min(period_start(since, resolution) for resolution in RESOLUTIONS)
+
+    query = db.session.query(
+        StockPrice.date, StockPrice.open_price, StockPrice.high_price,
+        StockPrice.low_price, StockPrice.close_price, StockPrice.volume
+    ).filter(StockPrice.stock_id == stock_id)
+    if since is not None:
+        query = query.filter(StockPrice.date >= since)
+
+    daily = pd.DataFrame(query.all(), columns=["date"] + ROLLUP_UPDATE_COLUMNS)
+
+    written = 0
+    for resolution in RESOLUTIONS:
+        rows = build_rollup_rows(daily, stock_id, resolution)
+        written += bulk_upsert(
+            StockPriceRollup, rows, ["stock_id", "resolution", "period_start"], ROLLUP_UPDATE_COLUMNS
+        )
+
+    logging.info(f"Updated {written} rollup rows for stock {stock_id} since {since or 'the start'}.")
+    return written
+
+
+def choose_resolution(start, end):
+    """Pick D / W / M for a date span so long views read a rollup instead of daily bars."""
+    if start is None or end is None:
+        return "M"
+
+    span = (pd.Timestamp(end) - pd.Timestamp(start)).days
+    if span <= AUTO_DAILY_MAX_DAYS:
+        return "D"
+    if span <= AUTO_WEEKLY_MAX_DAYS:
+        return "W"
+    return "M"
+
+
+def stocks_missing_rollups(stock_id=None):
+    """Ids of stocks (or just ``stock_id``) whose rollups are missing or start after their first daily bar."""
+    bars = db.session.query(StockPrice.stock_id, func.min(StockPrice.date)).group_by(StockPrice.stock_id)
+    periods = db.session.query(StockPriceRollup.stock_id, StockPriceRollup.resolution,
+                               func.min(StockPriceRollup.period_start)) \
+        .group_by(StockPriceRollup.stock_id, StockPriceRollup.resolution)
+    if stock_id is not None:
+        bars = bars.filter(StockPrice.stock_id == stock_id)
+        periods = periods.filter(StockPriceRollup.stock_id == stock_id)
+
+    first_period = {(stock, resolution): start for stock, resolution, start in periods.all()}
+    return [
+        stock for stock, first_bar in bars.all()
+        if any(first_period.get((stock, resolution)) is None
+               or first_period[(stock, resolution)] > period_start(first_bar, resolution)
+               for resolution in RESOLUTIONS)
+    ]
+
+
+def backfill_rollups():
+    """Rebuild the rollups of every stock whose rollups don't reach back to its first daily bar."""
+    for stock_id in stocks_missing_rollups():
+        update_rollups(stock_id)
@@ -0,0 +1,59 @@
+"""Payload size and serialization time of a 100k-point price figure.
+
+Compares the previous encoding (SVG Scatter, ISO date strings and float64
+JSON lists) with traces.line_trace (Scattergl, epoch-ms float64 and float32
+typed arrays). Sizes are measured on the JSON Dash sends, raw and gzipped,
+and decode time with json.loads as a stand-in for the browser's JSON.parse.
+
+    python scripts/bench_figure_encoding.py [points]
+"""
+import gzip
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objs as go
+from dash._utils import to_json
+from traces import line_trace
+
+REPEATS = 5
+
+
+def build_figures(points):
+    dates = pd.date_range("1990-01-01", periods=points, freq="h").to_numpy()
+    rng = np.random.default_rng(0)
+    prices = np.round(100 + np.cumsum(rng.normal(0, 0.5, points)), 2)
+
+    before = {"data": [go.Scatter(x=dates, y=prices, mode="lines", name="SYM")],
+              "layout": go.Layout(xaxis={"title": "Date"})}
+    after = {"data": [line_trace(dates, prices, name="SYM")],
+             "layout": go.Layout(xaxis={"title": "Date", "type": "date"})}
+    return before, after
+
+
+def measure(figure):
+    encode, decode = [], []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        payload = to_json(figure)
+        encode.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        json.loads(payload)
+        decode.append(time.perf_counter() - started)
+    raw = payload.encode("utf-8")
+    return len(raw), len(gzip.compress(raw)), min(encode) * 1000, min(decode) * 1000
+
+
+if __name__ == "__main__":
+    points = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    before, after = build_figures(points)
+    print(f"{points} points: {'json':>10} {'gzip':>10} {'encode':>9} {'decode':>9}  trace")
+    for label, figure in (("before", before), ("after", after)):
+        size, gzipped, encode_ms, decode_ms = measure(figure)
+        trace = figure["data"][0].type
+        print(f"{label:>14}: {size / 1024:>8.0f}KB {gzipped / 1024:>8.0f}KB {encode_ms:>7.1f}ms {decode_ms:>7.1f}ms  {trace}")
@@ -0,0 +1,63 @@
+"""Compare comparison-chart reads from SQL and from the Parquet price store.
+
+Loads synthetic full-history series for several symbols into a temporary
+SQLite database through the normal bulk-ingest path (which also writes the
+Parquet files), then times fetch_local_stock_data with and without the store.
+
+    python scripts/bench_price_store.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SYMBOLS = 10
+BARS = 12_000  # ~47 years of trading days
+REPEATS = 5
+
+tmp = tempfile.mkdtemp()
+os.environ["PRICE_STORE_DIR"] = os.path.join(tmp, "prices")
+os.environ["CACHE_DB_PATH"] = os.path.join(tmp, "cache.db")
+
+import config
+config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+
+import numpy as np
+import pandas as pd
+from flask import Flask
+import models  # noqa: F401  (registers the tables)
+import data_fetching
+import price_store
+from database import init_db
+
+
+def timed(symbols):
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        data_fetching.fetch_local_stock_data(symbols)
+    return (time.perf_counter() - started) / REPEATS * 1000
+
+
+if __name__ == "__main__":
+    server = Flask(__name__)
+    init_db(server)
+    index = pd.bdate_range(end="2024-12-31", periods=BARS)
+    symbols = [f"SYM{i}" for i in range(SYMBOLS)]
+
+    with server.app_context():
+        for symbol in symbols:
+            history = pd.DataFrame({
+                "Open": 1.0, "High": 1.0, "Low": 1.0,
+                "Close": np.random.rand(BARS) * 100, "Volume": 1000
+            }, index=index)
+            data_fetching.store_history(symbol, history, progress=lambda message, percent=None: None)
+
+        parquet_ms = timed(symbols)
+        price_store.USE_PRICE_STORE = False
+        sql_ms = timed(symbols)
+
+    print(f"{SYMBOLS} symbols x {BARS:,} bars")
+    print(f"SQL path:     {sql_ms:8.1f} ms")
+    print(f"Parquet path: {parquet_ms:8.1f} ms ({sql_ms / parquet_ms:.0f}x faster)")
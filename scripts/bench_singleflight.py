@@ -0,0 +1,79 @@
+"""Concurrent load test for provider request coalescing.
+
+Simulates several gunicorn workers (processes), each with several users
+(threads) picking the same symbols at once, against a fake provider that
+takes PROVIDER_LATENCY seconds per call. Prints the number of provider calls
+made with and without the single-flight layer.
+
+    python scripts/bench_singleflight.py
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROCESSES = 4
+THREADS = 8
+SYMBOLS = ["AAPL", "MSFT", "GOOGL"]
+PROVIDER_LATENCY = 0.5
+
+
+def _worker(cache_path, coalesce, calls):
+    os.environ["CACHE_DB_PATH"] = cache_path
+    import pandas as pd
+    import data_fetching
+    from cache import DiskCache
+    from singleflight import SingleFlight
+
+    data_fetching.provider_cache = DiskCache("provider", path=cache_path)
+    data_fetching.provider_flight = SingleFlight(
+        data_fetching.provider_cache, lock_dir=os.path.join(os.path.dirname(cache_path), "locks")
+    )
+
+    def fake_provider(symbol, outputsize="full"):
+        with calls.get_lock():
+            calls.value += 1
+        time.sleep(PROVIDER_LATENCY)
+        return pd.DataFrame({"Close": [1.0]}, index=pd.to_datetime(["2024-01-02"]))
+
+    data_fetching._fetch_alpha_vantage_daily = fake_provider
+    if not coalesce:
+        data_fetching.provider_flight.do = lambda key, fn, expires_at=None: fn()
+
+    threads = [
+        threading.Thread(target=data_fetching.fetch_stock_data, args=(SYMBOLS[i % len(SYMBOLS)],))
+        for i in range(THREADS)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def run(coalesce):
+    calls = multiprocessing.Value("i", 0)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "cache.db")
+        started = time.perf_counter()
+        processes = [
+            multiprocessing.Process(target=_worker, args=(cache_path, coalesce, calls))
+            for _ in range(PROCESSES)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+    return calls.value, elapsed
+
+
+if __name__ == "__main__":
+    requests = PROCESSES * THREADS
+    for coalesce in (False, True):
+        calls, elapsed = run(coalesce)
+        label = "single-flight" if coalesce else "no coalescing"
+        print(f"{label:>14}: {requests} requests -> {calls} provider calls ({elapsed:.2f}s)")
@@ -0,0 +1,86 @@
+"""Time the hot StockPrice queries before and after adding the composite indexes.
+
+Builds a synthetic stock_price table in a temporary SQLite file (stdlib only,
+so it runs anywhere) and times the three query shapes the app uses:
+
+  * the high-water mark:   SELECT MAX(date) ... WHERE stock_id = ?
+  * a point lookup:        ... WHERE stock_id = ? AND date = ?
+  * the chart read:        SELECT date, close_price ... WHERE stock_id = ? ORDER BY date
+
+    python scripts/bench_stock_price_index.py [rows]
+"""
+import datetime
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+SYMBOLS = 200
+REPEATS = 20
+
+
+def build(conn, rows):
+    conn.execute("""
+        CREATE TABLE stock_price (
+            id INTEGER PRIMARY KEY, stock_id INTEGER NOT NULL, date DATE NOT NULL,
+            open_price REAL, high_price REAL, low_price REAL, close_price REAL NOT NULL, volume INTEGER
+        )
+    """)
+    per_symbol = rows // SYMBOLS
+    start = datetime.date(1980, 1, 1)
+    dates = [(start + datetime.timedelta(days=i)).isoformat() for i in range(per_symbol)]
+    # Interleave symbols the way incremental daily ingestion lays rows out on disk
+    conn.executemany(
+        "INSERT INTO stock_price (stock_id, date, open_price, high_price, low_price, close_price, volume) "
+        "VALUES (?, ?, 1, 1, 1, ?, 100)",
+        ((stock_id, day, random.random()) for day in dates for stock_id in range(1, SYMBOLS + 1))
+    )
+    conn.commit()
+    return dates
+
+
+def timed(conn, sql, params_list):
+    started = time.perf_counter()
+    for params in params_list:
+        conn.execute(sql, params).fetchall()
+    return (time.perf_counter() - started) / len(params_list) * 1000
+
+
+def run_queries(conn, dates):
+    stock_ids = [random.randint(1, SYMBOLS) for _ in range(REPEATS)]
+    return {
+        "MAX(date) by stock": timed(
+            conn, "SELECT MAX(date) FROM stock_price WHERE stock_id = ?", [(s,) for s in stock_ids]),
+        "point lookup": timed(
+            conn, "SELECT id FROM stock_price WHERE stock_id = ? AND date = ?",
+            [(s, random.choice(dates)) for s in stock_ids]),
+        "ordered close read": timed(
+            conn, "SELECT date, close_price FROM stock_price WHERE stock_id = ? ORDER BY date",
+            [(s,) for s in stock_ids]),
+    }
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "bench.db"))
+        started = time.perf_counter()
+        dates = build(conn, rows)
+        print(f"Built {rows:,} rows for {SYMBOLS} symbols in {time.perf_counter() - started:.1f}s")
+
+        before = run_queries(conn, dates)
+
+        started = time.perf_counter()
+        conn.execute("CREATE UNIQUE INDEX uq_stock_price_stock_date ON stock_price (stock_id, date)")
+        conn.execute("CREATE INDEX ix_stock_price_stock_date_close ON stock_price (stock_id, date, close_price)")
+        conn.execute("ANALYZE")
+        print(f"Created indexes in {time.perf_counter() - started:.1f}s")
+
+        after = run_queries(conn, dates)
+        conn.close()
+
+    print(f"{'query':<20} {'before (ms)':>12} {'after (ms)':>12} {'speedup':>9}")
+    for name in before:
+        print(f"{name:<20} {before[name]:>12.2f} {after[name]:>12.2f} {before[name] / after[name]:>8.0f}x")
@@ -0,0 +1,103 @@
+"""Minimal OpenAI-compatible chat completions server for local testing.
+
+Answers every request with a canned reply, streamed word by word when the
+request asks for ``stream``. Run it and point the app at it:
+
+    python scripts/fake_openai_server.py [port]
+    CHAT_API_BASE_URL=http://127.0.0.1:8099/v1 CHATGPT_API_KEY=test gunicorn wsgi:server
+
+FAKE_TOKEN_DELAY (seconds per streamed word) and FAKE_FIRST_TOKEN_DELAY
+simulate model latency; with FAKE_RATE_LIMIT_EVERY=n every n-th request is
+answered 429 (Retry-After: FAKE_RETRY_AFTER). Prompts asking for a JSON
+array of n strings (llm_gateway.complete_batch) get one. /stats reports
+the request count and peak concurrency.
+"""
+import json
+import os
+import re
+import sys
+import time
+import uuid
+from flask import Flask, Response, jsonify, request
+
+TOKEN_DELAY = float(os.getenv("FAKE_TOKEN_DELAY", "0.05"))
+FIRST_TOKEN_DELAY = float(os.getenv("FAKE_FIRST_TOKEN_DELAY", "0.2"))
+REPLY_WORDS = int(os.getenv("FAKE_REPLY_WORDS", "40"))
+RATE_LIMIT_EVERY = int(os.getenv("FAKE_RATE_LIMIT_EVERY", "0"))
+RETRY_AFTER = os.getenv("FAKE_RETRY_AFTER", "0.1")
+BATCH_PROMPT = re.compile(r"JSON array of (\d+) strings")
+
+app = Flask(__name__)
+stats = {"requests": 0, "rate_limited": 0, "in_flight": 0, "max_in_flight": 0}
+
+
+def reply_for(messages):
+    prompt = messages[-1]["content"] if messages else ""
+    batch = BATCH_PROMPT.search(prompt)
+    if batch:
+        return [json.dumps([f"answer {number}" for number in range(1, int(batch.group(1)) + 1)])]
+    words = [f"word{i}" for i in range(REPLY_WORDS)]
+    return [f"Echo: {prompt[:40]}"] + [f" {word}" for word in words]
+
+
+def usage(messages, pieces):
+    prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in messages)
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": len(pieces),
+            "total_tokens": prompt_tokens + len(pieces)}
+
+
+@app.route("/v1/chat/completions", methods=["POST"])
+def chat_completions():
+    body = request.get_json()
+    messages, model = body.get("messages", []), body.get("model", "fake")
+    pieces = reply_for(messages)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    stats["requests"] += 1
+    if RATE_LIMIT_EVERY and stats["requests"] % RATE_LIMIT_EVERY == 0:
+        stats["rate_limited"] += 1
+        return jsonify({"error": {"message": "Rate limit reached", "type": "rate_limit_error"}}), 429, \
+            {"Retry-After": RETRY_AFTER}
+
+    if not body.get("stream"):
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        time.sleep(FIRST_TOKEN_DELAY + TOKEN_DELAY * len(pieces))
+        stats["in_flight"] -= 1
+        return jsonify({
+            "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "".join(pieces)}}],
+            "usage": usage(messages, pieces),
+        })
+
+    def generate():
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            time.sleep(FIRST_TOKEN_DELAY)
+            for i, piece in enumerate(pieces):
+                chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": model, "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                time.sleep(TOKEN_DELAY)
+            final = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            yield f"data: {json.dumps(final)}\n\n"
+            if (body.get("stream_options") or {}).get("include_usage"):
+                tail = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                        "model": model, "choices": [], "usage": usage(messages, pieces)}
+                yield f"data: {json.dumps(tail)}\n\n"
+            yield "data: [DONE]\n\n"
+        finally:
+            stats["in_flight"] -= 1
+
+    return Response(generate(), mimetype="text/event-stream")
+
+
+@app.route("/stats")
+def get_stats():
+    return jsonify(stats)
+
+
+if __name__ == "__main__":
+    app.run(host="127.0.0.1", port=int(sys.argv[1]) if len(sys.argv) > 1 else 8099, threaded=True)
@@ -0,0 +1,119 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from config import CACHE_DB_PATH
+
+try:
+    import fcntl  # POSIX only; without it coalescing is per process
+except ImportError:
+    fcntl = None
+
+LOCK_DIR = os.path.join(os.path.dirname(CACHE_DB_PATH), "locks")
+
+
+class _Call:
+    """An in-flight call that other threads can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent identical calls so only one of them reaches the provider.
+
+    Within a process, threads asking for a key that is already in flight wait
+    for that call and share its result. Calls given an ``expires_at`` are also
+    coalesced across processes: the leader holds a lock file for the key;
+    when another worker gets the lock afterwards it first looks in ``cache``
+    for the result the previous holder stored there.
+    Call and coalesce counts are recorded in ``cache``'s shared stats.
+    """
+
+    def __init__(self, cache, lock_dir=LOCK_DIR):
+        self.cache = cache
+        self.lock_dir = lock_dir
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, expires_at=None):
+        """Run ``fn()`` once for all concurrent callers of ``key`` and return its result.
+
+        When ``expires_at`` (a callable returning an epoch time) is given, the
+        result is written to the cache before the lock is released, so waiters
+        in other processes pick it up instead of calling the provider again.
+        Without it nothing is persisted and only this process's threads share
+        the call.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            self.cache.record("coalesced")
+            if call.error:
+                raise call.error
+            return call.result
+
+        try:
+            if expires_at:
+                call.result = self._run_exclusive(key, fn, expires_at)
+            else:
+                self.cache.record("provider_call")
+                call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _run_exclusive(self, key, fn, expires_at):
+        with self._file_lock(key):
+            entry = self.cache.get(key)
+            if entry is not None and entry.is_fresh:
+                self.cache.record("coalesced")  # ✅ Another worker fetched it while we waited
+                return entry.value
+
+            self.cache.record("provider_call")
+            result = fn()
+            self.cache.set(key, result, expires_at())
+            return result
+
+    def _file_lock(self, key):
+        return FileLock(os.path.join(self.lock_dir, hashlib.sha1(key.encode()).hexdigest() + ".lock"))
+
+
+class FileLock:
+    """Exclusive advisory lock on a file, held for the duration of a with-block."""
+
+    def __init__(self, path):
+        self.path = path
+        self.handle = None
+
+    def __enter__(self):
+        if fcntl is None:
+            return self
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.handle = open(self.path, "a")
+        started = time.perf_counter()
+        fcntl.flock(self.handle, fcntl.LOCK_EX)
+        waited = time.perf_counter() - started
+        if waited > 0.1:
+            logging.debug(f"Waited {waited:.2f}s for provider lock {os.path.basename(self.path)}")
+        return self
+
+    def __exit__(self, *exc):
+        if self.handle:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+            self.handle.close()
+            self.handle = None
+        return False
@@ -0,0 +1,90 @@
+"""Translate Dash DataTable custom paging/sorting/filtering into SQL.
+
+With ``page_action``/``sort_action``/``filter_action="custom"`` the table
+sends its ``filter_query`` string and ``sort_by`` list to the server. These
+helpers turn them into a parameterized WHERE clause and an ORDER BY clause;
+column names are checked against an allow-list and values are always bound,
+never interpolated.
+"""
+import logging
+import re
+
+# Operator as written in filter_query -> SQL operator ("i"/"s" case prefixes are dropped)
+OPERATORS = {
+    "=": "=", "eq": "=",
+    "!=": "!=", "ne": "!=",
+    "<": "<", "lt": "<",
+    "<=": "<=", "le": "<=",
+    ">": ">", "gt": ">",
+    ">=": ">=", "ge": ">=",
+    "contains": "LIKE",
+    "datestartswith": "LIKE",
+}
+
+LIKE_ESCAPE = "!"  # Not a backslash, which MySQL also treats as an escape inside string literals
+
+_CLAUSE = re.compile(
+    r"^\{(?P<column>[^}]+)\}\s*"
+    r"(?P<operator>[is]?(?:contains|datestartswith|eq|ne|lt|le|gt|ge)\b|>=|<=|!=|=|<|>)\s*"
+    r"(?P<value>.*)$"
+)
+
+
+def _like_escape(value):
+    return value.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2).replace("%", LIKE_ESCAPE + "%").replace("_", LIKE_ESCAPE + "_")
+
+
+def _parse_value(raw):
+    """Quoted values are strings; unquoted ones are numbers when they parse as one."""
+    raw = raw.strip()
+    if len(raw) >= 2 and raw[0] == raw[-1] and raw[0] in "\"'`":
+        return raw[1:-1].replace("\\" + raw[0], raw[0])
+    try:
+        return float(raw) if "." in raw else int(raw)
+    except ValueError:
+        return raw
+
+
+def translate_filter(filter_query, columns):
+    """Return ``(where_sql, params)`` for a DataTable ``filter_query``.
+
+    Clauses joined with ``&&`` become ANDed conditions. Clauses on unknown
+    columns or with unsupported syntax are skipped and logged. ``where_sql``
+    is an empty string when nothing applies.
+    """
+    conditions, params = [], {}
+    for i, part in enumerate(filter(None, (p.strip() for p in (filter_query or "").split(" && ")))):
+        match = _CLAUSE.match(part)
+        if not match or match["column"] not in columns:
+            logging.warning(f"Ignoring unsupported table filter: {part!r}")
+            continue
+
+        column, operator = match["column"], match["operator"]
+        operator = OPERATORS[operator[1:] if operator[0] in "is" and operator[1:] in OPERATORS else operator]
+        value = _parse_value(match["value"])
+        name = f"f{i}"
+
+        if operator == "LIKE":
+            prefix = "" if match["operator"].endswith("datestartswith") else "%"
+            params[name] = f"{prefix}{_like_escape(str(value))}%"
+            conditions.append(f"{column} LIKE :{name} ESCAPE '{LIKE_ESCAPE}'")
+        else:
+            params[name] = value
+            conditions.append(f"{column} {operator} :{name}")
+
+    return " AND ".join(conditions), params
+
+
+def translate_sort(sort_by, columns, default=()):
+    """Return an ORDER BY expression for a DataTable ``sort_by`` list.
+
+    ``default`` columns are appended as tie-breakers so paging is stable.
+    """
+    terms, used = [], set()
+    for item in sort_by or []:
+        column = item.get("column_id")
+        if column in columns and column not in used:
+            terms.append(f"{column} {'DESC' if item.get('direction') == 'desc' else 'ASC'}")
+            used.add(column)
+    terms += [f"{column} ASC" for column in default if column not in used]
+    return ", ".join(terms)
@@ -0,0 +1,36 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app modules are flat files in the repository root; the shared cache must not touch instance/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["CACHE_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="dashboard-tests-"), "cache.db")
+os.environ.setdefault("CHATGPT_API_KEY", "sk-test")
+os.environ["USE_PRICE_STORE"] = "0"
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    """Flask app with the models on a throwaway SQLite database."""
+    from flask import Flask
+    from database import db
+    import models  # noqa: F401 (registers the tables)
+
+    server = Flask(__name__)
+    server.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path_factory.mktemp('db') / 'test.db'}"
+    server.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(server)
+    with server.app_context():
+        db.create_all()
+    return server
+
+
+@pytest.fixture
+def app_context(app):
+    from database import db
+
+    with app.app_context():
+        yield
+        db.session.rollback()
@@ -0,0 +1,134 @@
+import re
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from categorizer import CompiledRules, apply_rules, validate_rule
+
+
+def rule(id, category, kind, pattern=None, priority=100, min_amount=None, max_amount=None):
+    return SimpleNamespace(id=id, category=category, kind=kind, pattern=pattern, priority=priority,
+                           min_amount=min_amount, max_amount=max_amount)
+
+
+def bookings(payees, amounts, ibans=None):
+    return pd.DataFrame({
+        "Beguenstigter": payees,
+        "Kontonummer_IBAN": ibans or [None] * len(payees),
+        "Betrag": amounts,
+        "category": ["Uncategorized"] * len(payees),
+    })
+
+
+def brute_force(rules, frame):
+    """Reference: test every rule on every row, in priority order."""
+    def matches(rule, payee, iban, amount):
+        if rule.min_amount is not None and amount < rule.min_amount:
+            return False
+        if rule.max_amount is not None and amount > rule.max_amount:
+            return False
+        if rule.kind == "amount":
+            return True
+        if rule.kind == "iban":
+            return (iban or "").replace(" ", "").upper().startswith(rule.pattern.replace(" ", "").upper())
+        pattern = rule.pattern if rule.kind == "regex" else re.escape(rule.pattern)
+        return re.search(pattern, payee or "", re.IGNORECASE | re.DOTALL) is not None
+
+    ordered = sorted(rules, key=lambda r: (r.priority, r.id))
+    return [next((r.category for r in ordered if matches(r, payee, iban, amount)), None)
+            for payee, iban, amount in zip(frame["Beguenstigter"], frame["Kontonummer_IBAN"], frame["Betrag"])]
+
+
+def test_first_rule_by_priority_wins():
+    rules = CompiledRules([rule(1, "Shopping", "payee", "rewe", priority=200),
+                           rule(2, "Groceries", "payee", "REWE", priority=10)])
+    assert rules.categorize(bookings(["Rewe Markt GmbH"], [-20.0])).tolist() == ["Groceries"]
+
+
+def test_payee_patterns_are_literal_substrings():
+    rules = CompiledRules([rule(1, "Dots", "payee", "a.b")])
+    assert rules.categorize(bookings(["xa.by", "axb"], [-1.0, -1.0])).tolist() == ["Dots", None]
+
+
+def test_iban_prefix_ignores_spaces_and_case():
+    rules = CompiledRules([rule(1, "Rent", "iban", "de12 3456")])
+    frame = bookings(["Landlord", "Other"], [-900.0, -900.0], ibans=["DE12 3456 7890", "DE99 0000"])
+    assert rules.categorize(frame).tolist() == ["Rent", None]
+
+
+def test_amount_ranges_apply_to_text_rules_and_alone():
+    rules = CompiledRules([
+        rule(1, "Big Amazon", "payee", "amazon", priority=1, max_amount=-100),
+        rule(2, "Amazon", "payee", "amazon", priority=2),
+        rule(3, "Income", "amount", priority=3, min_amount=1000),
+    ])
+    frame = bookings(["AMAZON EU", "Amazon EU", "Employer", "Kiosk"], [-250.0, -20.0, 3000.0, -2.0])
+    assert rules.categorize(frame).tolist() == ["Big Amazon", "Amazon", "Income", None]
+
+
+def test_missing_payees_are_matched_as_empty_text():
+    rules = CompiledRules([rule(1, "Named", "regex", "."), rule(2, "Blank", "regex", "^$")])
+    assert rules.categorize(bookings([None, "x"], [-1.0, -1.0])).tolist() == ["Blank", "Named"]
+
+
+def test_legacy_rules_the_combined_matcher_cannot_hold_still_match():
+    rules = CompiledRules([
+        rule(1, "Flagged", "regex", "(?i)netflix", priority=1),  # Global flag: invalid mid-pattern
+        rule(2, "Repeated", "regex", r"(ab)\1", priority=2),  # Backreference to another rule's group
+        rule(3, "Streaming", "payee", "flix", priority=3),
+    ])
+    assert [position for position, _ in rules.masked] == [0, 1]
+    frame = bookings(["NETFLIX.COM", "xababx", "Flixbus"], [-10.0, -1.0, -20.0])
+    assert rules.categorize(frame).tolist() == ["Flagged", "Repeated", "Streaming"]
+
+
+def test_apply_rules_keeps_existing_categories_without_a_match():
+    frame = bookings(["Rewe", "Unknown"], [-5.0, -5.0]).assign(category=["Old", "Kept"])
+    result = apply_rules(frame, CompiledRules([rule(1, "Groceries", "payee", "rewe")]))
+    assert result["category"].tolist() == ["Groceries", "Kept"]
+
+
+def test_combined_matcher_equals_brute_force():
+    rng = np.random.default_rng(42)
+    words = ["rewe", "aldi", "amazon", "paypal", "netflix", "dm", "shell", "bahn", "lidl", "miete"]
+    payees = [" ".join(rng.choice(words, size=rng.integers(1, 4))).upper() + f" {rng.integers(100)}"
+              for _ in range(3000)]
+    ibans = [f"DE{rng.integers(10, 99)} {rng.integers(1000, 9999)}" for _ in range(3000)]
+    amounts = rng.normal(-50, 400, size=3000).round(2)
+
+    rules = [rule(i, f"payee-{w}", "payee", w, priority=int(rng.integers(1, 50))) for i, w in enumerate(words)]
+    rules += [
+        rule(20, "regex-digits", "regex", r"\b(?:1|2)\d\b", priority=5),
+        rule(21, "regex-alt", "regex", "ald[ie]|lid+l", priority=30),
+        rule(22, "regex-scoped", "regex", "(?i:DM) ", priority=3),
+        rule(23, "iban-de1", "iban", "DE1", priority=25),
+        rule(24, "ranged", "payee", "amazon", priority=2, min_amount=-200, max_amount=-50),
+        rule(25, "large", "amount", priority=40, min_amount=500),
+        rule(26, "legacy", "regex", "(?i)shell", priority=1),
+    ]
+    frame = bookings(payees, amounts.tolist(), ibans)
+    assert CompiledRules(rules).categorize(frame).tolist() == brute_force(rules, frame)
+
+
+@pytest.mark.parametrize("kind, pattern, low, high, error", [
+    ("payee", "rewe", None, None, None),
+    ("regex", "ald[ie]", None, None, None),
+    ("regex", "(?i:ab)c", None, None, None),
+    ("amount", None, 10, None, None),
+    ("unknown", "x", None, None, "Unknown rule type"),
+    ("payee", "", None, None, "Please enter a pattern"),
+    ("amount", None, None, None, "minimum and/or maximum"),
+    ("payee", "x", 5, 1, "must not exceed"),
+    ("regex", "(", None, None, "Invalid regular expression"),
+    ("regex", "(?P<name>x)", None, None, "Named groups"),
+    ("regex", r"(a)\1", None, None, "Backreferences"),
+    ("regex", "(?i)rewe", None, None, "Inline flags must be scoped"),
+])
+def test_validate_rule(kind, pattern, low, high, error):
+    message = validate_rule(kind, pattern, low, high)
+    if error is None:
+        assert message is None
+    else:
+        assert error in message
@@ -0,0 +1,65 @@
+from datetime import date
+
+import pytest
+
+import database
+from database import bulk_upsert, db, require_unique_key
+from models import Stock, StockPrice
+
+UPDATE_COLUMNS = ["open_price", "high_price", "low_price", "close_price", "volume"]
+
+
+def bar(stock_id, day, close):
+    return {"stock_id": stock_id, "date": date(2024, 1, day), "open_price": close, "high_price": close,
+            "low_price": close, "close_price": close, "volume": 100}
+
+
+@pytest.fixture
+def stock(app_context):
+    stock = Stock(symbol="TST", name="Test")
+    db.session.add(stock)
+    db.session.commit()
+    yield stock
+    StockPrice.query.filter_by(stock_id=stock.id).delete()
+    db.session.delete(stock)
+    db.session.commit()
+
+
+def closes(stock):
+    return [(row.date.day, row.close_price)
+            for row in StockPrice.query.filter_by(stock_id=stock.id).order_by(StockPrice.date)]
+
+
+def test_upsert_updates_existing_rows_instead_of_duplicating(stock):
+    assert bulk_upsert(StockPrice, [bar(stock.id, 1, 10.0), bar(stock.id, 2, 11.0)],
+                       ["stock_id", "date"], UPDATE_COLUMNS) == 2
+    bulk_upsert(StockPrice, [bar(stock.id, 2, 12.0), bar(stock.id, 3, 13.0)], ["stock_id", "date"], UPDATE_COLUMNS)
+    assert closes(stock) == [(1, 10.0), (2, 12.0), (3, 13.0)]
+
+
+def test_upsert_in_chunks_reports_progress(stock):
+    progress = []
+    rows = [bar(stock.id, day, float(day)) for day in range(1, 8)]
+    bulk_upsert(StockPrice, rows, ["stock_id", "date"], UPDATE_COLUMNS, chunk_size=3,
+                on_chunk=lambda done, total: progress.append((done, total)))
+    assert progress == [(3, 7), (6, 7), (7, 7)]
+    assert len(closes(stock)) == 7
+
+
+def test_merge_fallback_for_dialects_without_an_upsert(stock, monkeypatch):
+    monkeypatch.setattr(database, "_upsert_statement", lambda *args: None)
+    bulk_upsert(StockPrice, [bar(stock.id, 1, 1.0)], ["stock_id", "date"], UPDATE_COLUMNS)
+    # A key repeated within one call and one already stored both end up as a single row
+    bulk_upsert(StockPrice, [bar(stock.id, 1, 2.0), bar(stock.id, 5, 5.0), bar(stock.id, 5, 6.0)],
+                ["stock_id", "date"], UPDATE_COLUMNS)
+    assert closes(stock) == [(1, 2.0), (5, 6.0)]
+
+
+def test_empty_upserts_do_nothing(app_context):
+    assert bulk_upsert(StockPrice, [], ["stock_id", "date"], UPDATE_COLUMNS) == 0
+
+
+def test_upserts_need_a_unique_key_on_the_conflict_columns(app_context):
+    require_unique_key(StockPrice, ["date", "stock_id"])  # Column order does not matter
+    with pytest.raises(RuntimeError, match="migrations.py"):
+        require_unique_key(StockPrice, ["date"])
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+from downsampling import MIN_POINTS, downsample, lttb_indices, points_for_width
+
+
+def test_short_series_are_unchanged():
+    x, y = np.arange(10), np.linspace(0, 1, 10)
+    out_x, out_y = downsample(x, y, max_points=100)
+    np.testing.assert_array_equal(out_x, x)
+    np.testing.assert_array_equal(out_y, y)
+
+
+def test_nan_values_are_dropped():
+    out_x, out_y = downsample(np.arange(5), [1.0, np.nan, 3.0, np.nan, 5.0], max_points=100)
+    np.testing.assert_array_equal(out_x, [0, 2, 4])
+    np.testing.assert_array_equal(out_y, [1.0, 3.0, 5.0])
+
+
+def test_point_budget_and_endpoints():
+    rng = np.random.default_rng(0)
+    x, y = np.arange(100_000), rng.normal(size=100_000).cumsum()
+    out_x, out_y = downsample(x, y, max_points=500)
+    assert len(out_x) <= 500
+    assert out_x[0] == 0 and out_x[-1] == len(x) - 1
+    assert np.all(np.diff(out_x) > 0)  # Still sorted along x, no duplicates
+
+
+def test_global_extremes_are_kept():
+    y = np.zeros(10_000)
+    y[1234], y[8765] = -50.0, 75.0  # Single-point spikes LTTB alone might skip
+    out_x, out_y = downsample(np.arange(len(y)), y, max_points=50)
+    assert out_y.min() == -50.0 and out_y.max() == 75.0
+    assert {1234, 8765} <= set(out_x.tolist())
+
+
+def test_datetime_axis():
+    dates = pd.date_range("2000-01-01", periods=5000, freq="D").to_numpy()
+    y = np.sin(np.arange(5000) / 100)
+    out_x, out_y = downsample(dates, y, max_points=300)
+    assert out_x.dtype == dates.dtype
+    assert len(out_x) <= 300 and out_x[0] == dates[0] and out_x[-1] == dates[-1]
+
+
+def test_lttb_returns_requested_count():
+    indices = lttb_indices(np.arange(1000), np.random.default_rng(1).random(1000), 100)
+    assert len(indices) == 100
+    assert indices[0] == 0 and indices[-1] == 999
+
+
+def test_points_for_width():
+    assert points_for_width(1000) == 2000
+    assert points_for_width(10) == MIN_POINTS
+    assert points_for_width(None) > 0
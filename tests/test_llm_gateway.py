@@ -0,0 +1,155 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+from llm_gateway import GatewayBusy, LLMGateway
+
+
+def reply(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def rate_limited():
+    response = SimpleNamespace(status_code=429, headers={}, request=None)  # Only what APIStatusError reads
+    return openai.RateLimitError("Too many requests", response=response, body=None)
+
+
+class FakeClient:
+    """Stands in for the OpenAI client; ``answer(messages)`` returns a reply or raises."""
+
+    def __init__(self, answer):
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self.answer = answer
+
+    def create(self, model, messages, **kwargs):
+        self.calls.append(messages)
+        return self.answer(messages)
+
+
+def gateway(max_concurrency=1, queue_timeout=5, answer=None):
+    g = LLMGateway(max_concurrency=max_concurrency, queue_timeout=queue_timeout, max_retries=2)
+    g._client = FakeClient(answer or (lambda messages: reply("ok")))
+    return g
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def test_free_slots_go_round_robin_between_users():
+    g = gateway(max_concurrency=1)
+    granted, threads = [], []
+
+    def take(user):
+        with g.slot(user):
+            granted.append(user)
+
+    with g.slot("holder"):
+        for user in ("alice", "alice", "alice", "bob"):
+            threads.append(threading.Thread(target=take, args=(user,)))
+            threads[-1].start()
+            wait_for(lambda: g.stats()["queue_depth"] == len(threads))
+    for thread in threads:
+        thread.join()
+
+    assert granted == ["alice", "bob", "alice", "alice"]
+
+
+def test_concurrency_is_bounded():
+    g = gateway(max_concurrency=2)
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def work(user):
+        with g.slot(user):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+
+    threads = [threading.Thread(target=work, args=(f"user{i % 3}",)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] == 2
+    assert g.stats()["in_flight"] == 0
+
+
+def test_waiting_too_long_raises_busy():
+    g = gateway(max_concurrency=1, queue_timeout=0.05)
+    with g.slot("holder"):
+        with pytest.raises(GatewayBusy):
+            with g.slot("late"):
+                pass
+    assert g.stats()["queue_depth"] == 0
+    with g.slot("late"):  # The slot is usable again once released
+        pass
+
+
+def test_retry_gives_the_slot_back_during_backoff():
+    attempts = []
+
+    def answer(messages):
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise rate_limited()
+        return reply("done")
+
+    g = gateway(max_concurrency=1, answer=answer)
+    g._retry_delay = lambda attempt, error: 0.3
+    result = []
+    thread = threading.Thread(target=lambda: result.append(g.complete([{"role": "user", "content": "hi"}], "alice")))
+    thread.start()
+    wait_for(lambda: len(attempts) == 1)
+    time.sleep(0.05)
+    assert g.stats()["in_flight"] == 0  # Backing off without holding the slot
+    with g.slot("bob"):  # Another user gets in meanwhile
+        pass
+    thread.join()
+    assert result == ["done"] and len(attempts) == 2
+
+
+def test_retries_are_limited():
+    def answer(messages):
+        raise rate_limited()
+
+    g = gateway(answer=answer)
+    g._retry_delay = lambda attempt, error: 0
+    with pytest.raises(openai.RateLimitError):
+        g.complete([{"role": "user", "content": "hi"}], "alice")
+    assert len(g._client.calls) == 3
+    assert g.stats()["in_flight"] == 0
+
+
+def test_complete_batch_packs_items_into_requests():
+    def answer(messages):
+        items = [line.split(". ", 1)[1] for line in messages[0]["content"].splitlines() if line[:1].isdigit()]
+        return reply(json.dumps([item.upper() for item in items]))
+
+    g = gateway(answer=answer)
+    progress = []
+    answers = g.complete_batch("Shout", [f"item {i}" for i in range(5)], batch_size=2,
+                               on_batch=lambda done, total: progress.append((done, total)))
+    assert answers == [f"ITEM {i}" for i in range(5)]
+    assert len(g._client.calls) == 3
+    assert progress == [(2, 5), (4, 5), (5, 5)]
+
+
+def test_complete_batch_falls_back_to_single_items():
+    def answer(messages):
+        content = messages[0]["content"]
+        return reply('["only one"]' if "numbered" in content else content.rsplit("\n", 1)[-1] + "!")
+
+    g = gateway(answer=answer)
+    assert g.complete_batch("Echo", ["a", "b"], batch_size=5) == ["a!", "b!"]
+    assert len(g._client.calls) == 3  # The batch, then one request per item
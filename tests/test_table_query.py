@@ -0,0 +1,58 @@
+from table_query import translate_filter, translate_sort
+
+COLUMNS = {"Buchungstag", "Beguenstigter", "Betrag", "category"}
+
+
+def test_comparison_operators_bind_values():
+    where, params = translate_filter("{Betrag} >= 10 && {category} eq \"Food\"", COLUMNS)
+    assert where == "Betrag >= :f0 AND category = :f1"
+    assert params == {"f0": 10, "f1": "Food"}
+
+
+def test_word_operators_and_case_prefixes():
+    where, params = translate_filter("{Betrag} le -5.5 && {category} ine 'Rent'", COLUMNS)
+    assert where == "Betrag <= :f0 AND category != :f1"
+    assert params == {"f0": -5.5, "f1": "Rent"}
+
+
+def test_contains_escapes_like_wildcards():
+    where, params = translate_filter("{Beguenstigter} icontains 100%_off!", COLUMNS)
+    assert where == "Beguenstigter LIKE :f0 ESCAPE '!'"
+    assert params == {"f0": "%100!%!_off!!%"}
+
+
+def test_datestartswith_anchors_at_the_start():
+    where, params = translate_filter("{Buchungstag} datestartswith 2024-03", COLUMNS)
+    assert where == "Buchungstag LIKE :f0 ESCAPE '!'"
+    assert params == {"f0": "2024-03%"}
+
+
+def test_unknown_columns_are_skipped():
+    where, params = translate_filter("{password} = x && {Betrag} < 0", COLUMNS)
+    assert where == "Betrag < :f1"
+    assert params == {"f1": 0}
+
+
+def test_injection_attempts_never_reach_the_sql():
+    where, params = translate_filter("{Betrag) OR 1=1; --} = 1", COLUMNS)
+    assert (where, params) == ("", {})
+
+    where, params = translate_filter("{category} = 'x'' OR ''1''=''1'", COLUMNS)
+    assert where == "category = :f0"
+    assert "OR" not in where and "'" not in where
+
+
+def test_unsupported_syntax_is_skipped():
+    assert translate_filter("{Betrag} between 1 and 2", COLUMNS) == ("", {})
+    assert translate_filter("", COLUMNS) == ("", {})
+    assert translate_filter(None, COLUMNS) == ("", {})
+
+
+def test_sort_allow_list_and_tie_breakers():
+    sort_by = [
+        {"column_id": "Betrag", "direction": "desc"},
+        {"column_id": "Betrag; DROP TABLE x", "direction": "asc"},
+        {"column_id": "Betrag", "direction": "asc"},
+    ]
+    assert translate_sort(sort_by, COLUMNS, default=("Buchungstag", "Betrag")) == "Betrag DESC, Buchungstag ASC"
+    assert translate_sort(None, COLUMNS, default=("Buchungstag",)) == "Buchungstag ASC"
@@ -0,0 +1,59 @@
+import base64
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objs as go
+
+from traces import WEBGL_MIN_POINTS, encode_x, encode_y, line_trace, line_traces, typed_array
+
+
+def decode(spec):
+    return np.frombuffer(base64.b64decode(spec["bdata"]), dtype="<" + spec["dtype"])
+
+
+def test_typed_array_round_trip():
+    values = np.array([1.5, -2.25, 3e10])
+    spec = typed_array(values)
+    assert spec["dtype"] == "f8"
+    np.testing.assert_array_equal(decode(spec), values)
+
+
+def test_dates_become_epoch_milliseconds():
+    dates = pd.to_datetime(["1970-01-01 00:00:00", "2024-03-04 12:00:00.123"], format="ISO8601").to_numpy()
+    np.testing.assert_array_equal(decode(encode_x(dates)), [0.0, 1709553600123.0])
+    # Object arrays of date strings (as read from JSON) are parsed the same way
+    np.testing.assert_array_equal(decode(encode_x(np.array(["1970-01-02"], dtype=object))), [86_400_000.0])
+
+
+def test_prices_use_float32_when_exact_to_the_cent():
+    spec = encode_y([101.25, 99.99, 1234.56])
+    assert spec["dtype"] == "f4"
+    assert np.abs(decode(spec) - [101.25, 99.99, 1234.56]).max() <= 0.005
+
+
+def test_large_values_keep_float64():
+    values = [123_456_789.01, 5.0]
+    spec = encode_y(values)
+    assert spec["dtype"] == "f8"
+    np.testing.assert_array_equal(decode(spec), values)
+
+
+def test_empty_and_nan_series():
+    assert decode(encode_y([])).size == 0
+    assert np.isnan(decode(encode_y([1.0, np.nan]))[1])
+
+
+def test_line_trace_switches_to_webgl_by_length():
+    assert isinstance(line_trace(np.arange(10), np.arange(10.0)), go.Scatter)
+    n = WEBGL_MIN_POINTS
+    assert isinstance(line_trace(np.arange(n), np.arange(float(n))), go.Scattergl)
+
+
+def test_line_traces_decide_by_the_figure_total():
+    half = WEBGL_MIN_POINTS // 2 + 1
+    series = [(name, np.arange(half), np.arange(float(half))) for name in ("A", "B")]
+    traces = line_traces(series)
+    assert all(isinstance(trace, go.Scattergl) for trace in traces)
+    assert [trace.name for trace in traces] == ["A", "B"]
+
+    assert all(isinstance(trace, go.Scatter) for trace in line_traces(series[:1]))
@@ -0,0 +1,79 @@
+import io
+
+import pandas as pd
+
+from transaction_import import (content_hashes, normalize_chunk, parse_german_amounts, parse_german_dates,
+                                read_csv_chunks)
+
+
+def test_german_amounts():
+    values = pd.Series(["-1.234,56", "12,5", " 7,00 €", "1.000", "12.50", "", "abc"])
+    parsed = parse_german_amounts(values)
+    assert parsed.tolist()[:5] == [-1234.56, 12.5, 7.0, 1.0, 12.5]  # No decimal comma: the dot is decimal
+    assert parsed.iloc[5:].isna().all()
+
+
+def test_numeric_amounts_pass_through():
+    assert parse_german_amounts(pd.Series([1, -2.5])).tolist() == [1.0, -2.5]
+
+
+def test_german_dates():
+    parsed = parse_german_dates(pd.Series(["31.12.23", "01.02.2024", "2024-03-04", "32.13.24", None]))
+    assert parsed.iloc[:3].tolist() == [pd.Timestamp("2023-12-31"), pd.Timestamp("2024-02-01"),
+                                        pd.Timestamp("2024-03-04")]
+    assert parsed.iloc[3:].isna().all()
+
+
+def test_normalize_chunk_maps_aliases_and_skips_unreadable_rows():
+    chunk = pd.DataFrame({
+        " Buchungstag ": ["01.02.24", "garbage", "03.02.24"],
+        "Valuta": ["01.02.24", "02.02.24", "03.02.24"],
+        "Beguenstigter/Zahlungspflichtiger": [" REWE ", "X", ""],
+        "IBAN": ["DE12 3456", None, "DE99"],
+        "Betrag": ["-12,34", "1,00", "5"],
+    })
+    frame, skipped = normalize_chunk(chunk)
+    assert skipped == 1
+    assert frame["Beguenstigter"].tolist()[0] == "REWE"
+    assert pd.isna(frame["Beguenstigter"].iloc[1])  # Blank payee becomes NULL
+    assert frame["Kontonummer_IBAN"].tolist() == ["DE123456", "DE99"]
+    assert frame["Betrag"].tolist() == [-12.34, 5.0]
+    assert frame["category"].tolist() == ["Uncategorized", "Uncategorized"]
+
+
+def _bookings(payees, amounts):
+    return pd.DataFrame({
+        "Buchungstag": pd.to_datetime(["2024-01-02"] * len(payees)),
+        "Valutadatum": pd.to_datetime(["2024-01-02"] * len(payees)),
+        "Beguenstigter": payees,
+        "Kontonummer_IBAN": ["DE1"] * len(payees),
+        "Betrag": amounts,
+    })
+
+
+def test_identical_bookings_get_distinct_hashes():
+    hashes = content_hashes(_bookings(["Cafe", "Cafe", "Bakery"], [-3.5, -3.5, -2.0]))
+    assert len(set(hashes)) == 3
+
+
+def test_hashes_are_stable_across_chunks_and_reimports():
+    frame = _bookings(["Cafe", "Cafe", "Cafe", "Bakery"], [-3.5, -3.5, -3.5, -2.0])
+    whole = content_hashes(frame)
+
+    seen = {}
+    chunked = content_hashes(frame.iloc[:2], seen) + content_hashes(frame.iloc[2:].reset_index(drop=True), seen)
+    assert chunked == whole
+    assert content_hashes(frame) == whole
+
+
+def test_amount_formatting_does_not_change_the_hash():
+    assert content_hashes(_bookings(["A"], [-3.5])) == content_hashes(_bookings(["A"], [-3.50000001]))
+    assert content_hashes(_bookings(["A"], [-3.5])) != content_hashes(_bookings(["A"], [-3.51]))
+
+
+def test_csv_chunks_detect_encoding_and_separator():
+    raw = "Buchungstag;Beguenstigter;Betrag\n01.02.24;Bäckerei Müller;-3,50\n".encode("cp1252")
+    chunks = list(read_csv_chunks(io.BytesIO(raw)))
+    assert len(chunks) == 1
+    assert chunks[0]["Beguenstigter"].tolist() == ["Bäckerei Müller"]
+    assert chunks[0]["Betrag"].tolist() == ["-3,50"]
@@ -0,0 +1,66 @@
+"""Line traces for large series.
+
+Figures with many points in total switch from SVG ``Scatter`` to WebGL
+``Scattergl`` (all traces of a figure alike, see ``line_traces``), and x/y are
+sent as base64 typed arrays (``{"dtype", "bdata"}``, understood by
+plotly.js) instead of JSON lists: dates become epoch milliseconds and
+values float32 when that loses less than FLOAT32_MAX_ERROR.
+"""
+import base64
+import numpy as np
+import pandas as pd
+import plotly.graph_objs as go
+from config import WEBGL_MIN_POINTS
+
+FLOAT32_MAX_ERROR = 0.005  # Half a cent: prices and amounts stay exact to two decimals
+TYPED_ARRAY_DTYPES = {np.dtype("float64"): "f8", np.dtype("float32"): "f4", np.dtype("int32"): "i4"}
+
+
+def typed_array(values):
+    """Encode a float64/float32/int32 numpy array as a plotly.js typed-array spec."""
+    values = np.ascontiguousarray(values)
+    return {
+        "dtype": TYPED_ARRAY_DTYPES[values.dtype],
+        "bdata": base64.b64encode(values.astype(values.dtype.newbyteorder("<")).tobytes()).decode("ascii"),
+    }
+
+
+def encode_x(x):
+    """Dates as epoch milliseconds (float64, exact to the millisecond), numbers as float64."""
+    x = np.asarray(x)
+    if x.dtype == object:
+        x = pd.to_datetime(x).to_numpy()
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype("datetime64[ms]").astype(np.int64).astype(np.float64)
+    return typed_array(x.astype(np.float64))
+
+
+def encode_y(y):
+    """Values as float32 where that keeps them within FLOAT32_MAX_ERROR, float64 otherwise."""
+    y = np.asarray(y, dtype=np.float64)
+    y32 = y.astype(np.float32)
+    error = np.abs(y32.astype(np.float64) - y)
+    if not len(y) or np.nanmax(error, initial=0) <= FLOAT32_MAX_ERROR:
+        return typed_array(y32)
+    return typed_array(y)
+
+
+def use_webgl(n_points):
+    """True when a figure has enough points that WebGL renders it faster than SVG."""
+    return n_points >= WEBGL_MIN_POINTS
+
+
+def line_trace(x, y, name=None, mode="lines", webgl=None, **kwargs):
+    """``Scatter`` or ``Scattergl`` line with binary x/y; date x axes need ``type="date"`` in the layout.
+
+    ``webgl`` defaults to deciding by this trace's length alone.
+    """
+    webgl = use_webgl(len(y)) if webgl is None else webgl
+    trace = go.Scattergl if webgl else go.Scatter
+    return trace(x=encode_x(x), y=encode_y(y), name=name, mode=mode, **kwargs)
+
+
+def line_traces(series, mode="lines", **kwargs):
+    """Line traces for ``(name, x, y)`` series; WebGL for all of them when the figure's total points call for it."""
+    webgl = use_webgl(sum(len(y) for _, _, y in series))
+    return [line_trace(x, y, name=name, mode=mode, webgl=webgl, **kwargs) for name, x, y in series]
@@ -0,0 +1,246 @@
+"""Import Sparkasse CSV / XLSX account statements into the transaction tables.
+
+Files are parsed in chunks of IMPORT_CHUNK_ROWS rows, dates and decimal
+commas are normalized column-wise, the categorization rules are applied,
+and every booking gets a content hash.
+The hash column has a unique index, so importing the same (or an
+overlapping) export twice only inserts bookings that are not stored yet.
+
+    python transaction_import.py export.csv [table]   # stream a file from disk
+"""
+import base64
+import codecs
+import hashlib
+import io
+import logging
+import time
+import pandas as pd
+from sqlalchemy import inspect, text
+from database import db
+from models import transaction_table_schema
+from categorizer import load_rules, apply_rules, UNCATEGORIZED
+
+IMPORT_CHUNK_ROWS = 20000
+
+# Target column -> header names used by the different Sparkasse export formats
+COLUMN_ALIASES = {
+    "Buchungstag": ["Buchungstag"],
+    "Valutadatum": ["Valutadatum", "Valuta"],
+    "Beguenstigter": ["Beguenstigter/Zahlungspflichtiger", "Begünstigter/Zahlungspflichtiger",
+                      "Name Zahlungsbeteiligter", "Beguenstigter"],
+    "Kontonummer_IBAN": ["Kontonummer/IBAN", "IBAN Zahlungsbeteiligter", "Kontonummer", "IBAN", "Kontonummer_IBAN"],
+    "Betrag": ["Betrag"],
+    "category": ["category", "Kategorie"],
+}
+HASH_COLUMNS = ["Buchungstag", "Valutadatum", "Beguenstigter", "Kontonummer_IBAN", "Betrag"]
+
+
+def parse_german_dates(values):
+    """Parse dd.mm.yy / dd.mm.yyyy (and ISO) date strings; unparseable values become NaT."""
+    values = values.astype("string").str.strip()
+    parsed = pd.to_datetime(values, format="%d.%m.%y", errors="coerce")
+    for fmt in ("%d.%m.%Y", "ISO8601"):
+        missing = parsed.isna() & values.notna()
+        if not missing.any():
+            break
+        parsed = parsed.fillna(pd.to_datetime(values[missing], format=fmt, errors="coerce"))
+    return parsed
+
+
+def parse_german_amounts(values):
+    """Parse amounts like ``-1.234,56`` (or already numeric values) to floats."""
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(float)
+
+    values = values.astype("string").str.strip().str.replace(r"[\s€]", "", regex=True)
+    comma = values.str.contains(",", regex=False, na=False)
+    # Only strip dots as thousands separators when a decimal comma is present
+    values = values.where(~comma, values.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    return pd.to_numeric(values, errors="coerce")
+
+
+def normalize_chunk(chunk):
+    """Map a raw export chunk onto the table columns; returns (frame, skipped_rows)."""
+    chunk = chunk.rename(columns=lambda c: str(c).strip())
+    frame = pd.DataFrame(index=chunk.index)
+    for column, aliases in COLUMN_ALIASES.items():
+        source = next((alias for alias in aliases if alias in chunk.columns), None)
+        frame[column] = chunk[source] if source else None
+
+    frame["Buchungstag"] = parse_german_dates(frame["Buchungstag"])
+    frame["Valutadatum"] = parse_german_dates(frame["Valutadatum"])
+    frame["Betrag"] = parse_german_amounts(frame["Betrag"]).round(2)
+    for column in ("Beguenstigter", "Kontonummer_IBAN", "category"):
+        frame[column] = frame[column].astype("string").str.strip().replace("", pd.NA)
+    frame["Kontonummer_IBAN"] = frame["Kontonummer_IBAN"].str.replace(" ", "", regex=False)
+    frame["category"] = frame["category"].fillna(UNCATEGORIZED)
+
+    valid = frame["Buchungstag"].notna() & frame["Betrag"].notna()
+    return frame[valid].reset_index(drop=True), int((~valid).sum())
+
+
+def booking_keys(frame):
+    """Canonical text of each booking's content (the columns stored in the table)."""
+    def date_text(values):
+        return pd.to_datetime(values).dt.strftime("%Y-%m-%d").fillna("")
+
+    return (
+        date_text(frame["Buchungstag"]) + "|" + date_text(frame["Valutadatum"]) + "|"
+        + frame["Beguenstigter"].astype("string").fillna("") + "|"
+        + frame["Kontonummer_IBAN"].astype("string").fillna("") + "|"
+        + frame["Betrag"].astype(float).map("{:.2f}".format)
+    )
+
+
+def content_hashes(frame, seen=None):
+    """SHA-1 per booking, numbering identical bookings so each one is kept.
+
+    ``seen`` carries the per-key counts across chunks of one file, so two
+    identical card payments on the same day stay two bookings, and
+    re-importing the same file reproduces exactly the same hashes.
+    """
+    keys = booking_keys(frame)
+    seen = {} if seen is None else seen
+    ordinal = keys.groupby(keys).cumcount() + keys.map(seen).fillna(0).astype(int)
+    for key, count in keys.value_counts().items():
+        seen[key] = seen.get(key, 0) + count
+
+    return [hashlib.sha1(f"{key}|{n}".encode("utf-8")).hexdigest() for key, n in zip(keys, ordinal)]
+
+
+def _detect_encoding(head):
+    """Sparkasse exports are usually Windows-1252; newer ones are UTF-8."""
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "cp1252"
+
+
+def read_csv_chunks(stream, chunk_rows=IMPORT_CHUNK_ROWS):
+    """Yield DataFrame chunks from a binary CSV stream without reading it all at once."""
+    stream = io.BufferedReader(stream, buffer_size=65536) if not hasattr(stream, "peek") else stream
+    head = stream.peek(65536)
+    encoding = _detect_encoding(head)
+    first_line = head.split(b"\n", 1)[0].decode(encoding, errors="ignore")
+    sep = ";" if first_line.count(";") >= first_line.count(",") else ","
+
+    text_stream = io.TextIOWrapper(stream, encoding=encoding, newline="")
+    yield from pd.read_csv(text_stream, sep=sep, dtype=str, chunksize=chunk_rows, keep_default_na=False)
+
+
+def read_xlsx_chunks(stream, chunk_rows=IMPORT_CHUNK_ROWS):
+    """Yield DataFrame chunks from the first sheet of an XLSX workbook (read-only mode)."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(value).strip() if value is not None else "" for value in next(rows, [])]
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= chunk_rows:
+                yield pd.DataFrame(batch, columns=header)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header)
+    finally:
+        workbook.close()
+
+
+def _existing_hashes(table, hashes):
+    """Return which of ``hashes`` are already stored (one indexed IN query per slice)."""
+    existing = set()
+    for start in range(0, len(hashes), 1000):
+        batch = hashes[start:start + 1000]
+        placeholders = ", ".join(f":h{i}" for i in range(len(batch)))
+        rows = db.session.execute(
+            text(f"SELECT content_hash FROM {table} WHERE content_hash IN ({placeholders})"),
+            {f"h{i}": value for i, value in enumerate(batch)}
+        ).fetchall()
+        existing.update(row[0] for row in rows)
+    return existing
+
+
+def missing_migration(table):
+    """Why ``table`` cannot take imports until ``python migrations.py`` has run, or None if it can."""
+    inspector = inspect(db.engine)
+    if not inspector.has_table(table):
+        return f"The {table} table does not exist yet. Run `python migrations.py` before importing."
+    if "content_hash" not in {column["name"] for column in inspector.get_columns(table)}:
+        return f"The {table} table has no content_hash column yet. Run `python migrations.py` before importing."
+    return None
+
+
+def import_chunks(chunks, table, progress=None):
+    """Normalize, hash, dedupe and bulk-insert chunks into ``table``; returns a summary dict."""
+    error = missing_migration(table)
+    if error:
+        raise RuntimeError(error)
+
+    schema = transaction_table_schema(table)
+    insert = schema.insert().prefix_with("IGNORE", dialect="mysql").prefix_with("OR IGNORE", dialect="sqlite")
+    summary = {"read": 0, "inserted": 0, "duplicates": 0, "skipped": 0}
+    seen, rules = {}, load_rules()
+    started = time.perf_counter()
+
+    for chunk in chunks:
+        frame, skipped = normalize_chunk(chunk)
+        summary["read"] += len(chunk)
+        summary["skipped"] += skipped
+        if frame.empty:
+            continue
+
+        frame["content_hash"] = content_hashes(frame, seen)
+        frame = frame[~frame["content_hash"].isin(_existing_hashes(table, frame["content_hash"].tolist()))]
+        summary["duplicates"] += len(chunk) - skipped - len(frame)
+
+        if not frame.empty:
+            frame = apply_rules(frame, rules).assign(
+                Buchungstag=frame["Buchungstag"].dt.date,
+                Valutadatum=frame["Valutadatum"].dt.date,
+            ).astype(object).where(frame.notna(), None)
+            db.session.execute(insert, frame.to_dict("records"))  # ✅ One executemany per chunk
+            db.session.commit()
+            summary["inserted"] += len(frame)
+
+        if progress:
+            progress(f"Read {summary['read']} rows, inserted {summary['inserted']}...")
+
+    summary["seconds"] = round(time.perf_counter() - started, 2)
+    logging.info(f"Imported into {table}: {summary}")
+    return summary
+
+
+def import_file(stream, filename, table, progress=None):
+    """Import a binary file-like CSV or XLSX export into ``table``."""
+    reader = read_xlsx_chunks if filename.lower().endswith((".xlsx", ".xlsm")) else read_csv_chunks
+    return import_chunks(reader(stream), table, progress=progress)
+
+
+def import_upload(contents, filename, table, progress=None):
+    """Import the base64 data URL delivered by ``dcc.Upload``."""
+    _, encoded = contents.split(",", 1)
+    return import_file(io.BytesIO(base64.b64decode(encoded)), filename, table, progress)
+
+
+def format_summary(summary):
+    """One-line description of an import summary for the UI."""
+    return (f"Imported {summary['inserted']} new bookings ({summary['duplicates']} already present, "
+            f"{summary['skipped']} unreadable rows skipped) in {summary['seconds']}s.")
+
+
+if __name__ == "__main__":
+    import sys
+    from flask import Flask
+    from database import init_db
+
+    server = Flask(__name__)
+    init_db(server)
+    with server.app_context():
+        path = sys.argv[1]
+        with open(path, "rb", buffering=65536) as f:
+            print(format_summary(import_file(f, path, sys.argv[2] if len(sys.argv) > 2 else "sparkasse")))
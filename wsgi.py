@@ -1,4 +1,7 @@
 from app import server  # Import Flask server instance
+from jobs import fail_interrupted_jobs
 
 if __name__ == "__main__":
+    with server.app_context():
+        fail_interrupted_jobs()
     server.run(host="0.0.0.0", port=8050, debug=True)